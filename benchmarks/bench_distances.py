@@ -0,0 +1,33 @@
+"""Distance kernels: one sample against a map of prototypes, and a single DTW alignment."""
+from hysom.train_functions import dtw, njit_dtw, euclidean
+from .synthetic import make_loops, make_prototypes
+
+class DistanceKernels:
+    params = ([8, 16], [50, 100, 200])
+    param_names = ["map_side", "seq_len"]
+    timeout = 300
+
+    def setup(self, map_side, seq_len):
+        self.prototypes = make_prototypes(map_side, map_side, seq_len)
+        self.sample = make_loops(1, seq_len, seed = 2)[0]
+        # Compile (or load from numba's cache) outside of the timed code
+        dtw(self.prototypes, self.sample)
+        njit_dtw(self.prototypes[0, 0], self.sample)
+
+    def time_dtw(self, map_side, seq_len):
+        dtw(self.prototypes, self.sample)
+
+    def time_euclidean(self, map_side, seq_len):
+        euclidean(self.prototypes, self.sample)
+
+class SingleDTW:
+    params = [50, 100, 200, 400]
+    param_names = ["seq_len"]
+    timeout = 300
+
+    def setup(self, seq_len):
+        self.x, self.y = make_loops(2, seq_len)
+        njit_dtw(self.x, self.y)
+
+    def time_njit_dtw(self, seq_len):
+        njit_dtw(self.x, self.y)
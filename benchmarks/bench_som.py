@@ -0,0 +1,85 @@
+"""HSOM training and evaluation on synthetic loops. Only long-standing public methods are used, so older releases can be benchmarked too."""
+import contextlib
+import io
+from hysom import HSOM
+from hysom.train_functions import dtw, euclidean
+from .synthetic import make_loops, make_prototypes
+
+distance_functions = {"dtw": dtw, "euclidean": euclidean}
+
+def make_som(map_side, seq_len, distance = "dtw"):
+    som = HSOM(width = map_side, height = map_side, input_dim = (seq_len, 2), random_seed = 0)
+    som.set_init_prototypes(make_prototypes(map_side, map_side, seq_len))
+    som.distance_function = distance_functions[distance] # used by the evaluation methods, set by `train` otherwise
+    return som
+
+def quiet_train(som, data, **params):
+    # `train` prints a summary at the end of every run
+    with contextlib.redirect_stdout(io.StringIO()):
+        som.train(data, **params)
+
+def clear_caches(som):
+    # Projections are cached by recent versions; time the computation, not the cache lookup
+    if hasattr(som, "clear_projection_cache"):
+        som.clear_projection_cache()
+
+class GetBMU:
+    params = ([8, 16, 32], ["dtw", "euclidean"])
+    param_names = ["map_side", "distance"]
+    timeout = 300
+
+    def setup(self, map_side, distance):
+        self.som = make_som(map_side, 100, distance)
+        self.sample = make_loops(1, 100, seed = 2)[0]
+        self.som.get_BMU(self.sample)
+
+    def time_get_BMU(self, map_side, distance):
+        self.som.get_BMU(self.sample)
+
+class TrainOnline:
+    params = ([4, 8, 16], [50, 100])
+    param_names = ["map_side", "seq_len"]
+    timeout = 600
+    nsamples = 200
+
+    def setup(self, map_side, seq_len):
+        self.data = make_loops(self.nsamples, seq_len)
+        quiet_train(make_som(map_side, seq_len), self.data[:10], epochs = 1) # compile
+
+    def time_train(self, map_side, seq_len):
+        quiet_train(make_som(map_side, seq_len), self.data, epochs = 1)
+
+class Evaluate:
+    params = ([8, 16], ["dtw", "euclidean"])
+    param_names = ["map_side", "distance"]
+    timeout = 600
+    nsamples = 1000
+
+    def setup(self, map_side, distance):
+        self.data = make_loops(self.nsamples, 100, seed = 3)
+        self.som = make_som(map_side, 100, distance)
+        self.som.classify(self.data[:10])
+        self.som.topographic_error(self.data[:10])
+
+    def time_classify(self, map_side, distance):
+        clear_caches(self.som)
+        self.som.classify(self.data)
+
+    def time_topographic_error(self, map_side, distance):
+        clear_caches(self.som)
+        self.som.topographic_error(self.data)
+
+class PretrainedSOM:
+    timeout = 300
+
+    def setup(self):
+        from hysom.pretrainedSOM import get_generalTQSOM
+        self.get_generalTQSOM = get_generalTQSOM
+        get_generalTQSOM()
+
+    def time_get_generalTQSOM(self):
+        self.get_generalTQSOM()
+
+    def timeraw_import_and_get_generalTQSOM(self):
+        # Cold start in a fresh interpreter: import and first load
+        return "from hysom.pretrainedSOM import get_generalTQSOM; get_generalTQSOM()"
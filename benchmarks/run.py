@@ -0,0 +1,172 @@
+"""
+Minimal runner for the benchmark suite, for machines without asv.
+
+It runs the same asv-style benchmark classes (``time_*`` and ``timeraw_*`` methods with
+``params``/``param_names``/``setup``), stores the results as JSON and compares two result files::
+
+    python -m benchmarks.run                       # run everything, save to benchmarks/results/<machine>/
+    python -m benchmarks.run --quick -b GetBMU     # one repeat, only benchmarks matching a regex
+    python -m benchmarks.run --compare OLD.json NEW.json
+
+Everything runs locally on the CPU; nothing is downloaded.
+"""
+import os
+import re
+import sys
+import json
+import time
+import timeit
+import inspect
+import argparse
+import platform
+import itertools
+import glob
+import subprocess
+import importlib
+from datetime import datetime, timezone
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results") # not versioned: timings are only comparable on one machine
+MIN_REPEAT = 3 # repeats per run needed by --compare to report a change
+
+def discover(pattern = None):
+    # Yield (name, class, method name, params) for every benchmark matching `pattern`
+    for path in sorted(glob.glob(os.path.join(BENCHMARKS_DIR, "bench_*.py"))):
+        module_name = os.path.splitext(os.path.basename(path))[0]
+        module = importlib.import_module(f"benchmarks.{module_name}")
+        for class_name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__:
+                continue
+            for method in sorted(name for name in dir(cls) if name.startswith(("time_", "timeraw_"))):
+                for params in _param_combinations(cls):
+                    name = f"{module_name}.{class_name}.{method}{_format_params(params)}"
+                    if pattern is None or re.search(pattern, name):
+                        yield name, cls, method, params
+
+def run_benchmark(cls, method, params, repeat):
+    instance = cls()
+    if method.startswith("timeraw_"):
+        code = getattr(instance, method)(*params)
+        samples = [_run_subprocess(f"import time; t = time.perf_counter(); {code}; print(time.perf_counter() - t)")
+                   for _ in range(repeat)]
+        return {"unit": "seconds", "samples": samples}
+
+    if hasattr(instance, "setup"):
+        instance.setup(*params)
+    try:
+        func = getattr(instance, method)
+        timer = timeit.Timer(lambda: func(*params))
+        number, _ = timer.autorange()
+        samples = [t / number for t in timer.repeat(repeat = repeat, number = number)]
+    finally:
+        if hasattr(instance, "teardown"):
+            instance.teardown(*params)
+    return {"unit": "seconds", "samples": samples, "number": number}
+
+def run(pattern, repeat, output):
+    results = {}
+    for name, cls, method, params in discover(pattern):
+        start = time.perf_counter()
+        try:
+            result = run_benchmark(cls, method, params, repeat)
+        except NotImplementedError: # asv convention to skip a parameter combination
+            print(f"{name}: skipped")
+            continue
+        result["median"] = sorted(result["samples"])[len(result["samples"]) // 2]
+        results[name] = result
+        print(f"{name}: {_format_value(result['median'])} ({time.perf_counter() - start:.1f} s)")
+
+    report = {"hysom_version": _hysom_version(), "commit": _git_commit(), "date": datetime.now(timezone.utc).isoformat(),
+              "machine": _machine_info(), "repeat": repeat, "results": results}
+    if output is None:
+        version, commit = report["hysom_version"], report["commit"][:8]
+        filename = commit if version == "unknown" else f"{version}-{commit}"
+        output = os.path.join(RESULTS_DIR, report["machine"]["name"], f"{filename}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok = True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent = 1)
+    print(f"Results saved to {output}")
+
+def compare(old_path, new_path, factor):
+    # A benchmark is reported as slower/faster only when the ratio of the medians is beyond `factor` and the
+    # samples of both runs do not overlap, which needs at least MIN_REPEAT repeats per run
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    if min(old["repeat"], new["repeat"]) < MIN_REPEAT:
+        print(f"Runs with fewer than {MIN_REPEAT} repeats (e.g. --quick) are shown but never reported as changes")
+    print(f"{'benchmark':<70} {'old':>10} {'new':>10} {'ratio':>7}")
+    regressions = 0
+    for name in sorted(set(old["results"]) & set(new["results"])):
+        before, after = old["results"][name], new["results"][name]
+        ratio = after["median"] / before["median"]
+        slower = ratio > factor and _separated(before["samples"], after["samples"])
+        faster = ratio < 1 / factor and _separated(after["samples"], before["samples"])
+        flag = "  slower" if slower else ("  faster" if faster else "")
+        regressions += slower
+        print(f"{name:<70} {_format_value(before['median']):>10} "
+              f"{_format_value(after['median']):>10} {ratio:>7.2f}{flag}")
+    return regressions
+
+def _separated(low, high):
+    # True if every sample in `high` is above every sample in `low`
+    return min(len(low), len(high)) >= MIN_REPEAT and min(high) > max(low)
+
+def _param_combinations(cls):
+    params = getattr(cls, "params", None)
+    if params is None:
+        return [()]
+    if len(getattr(cls, "param_names", ())) > 1:
+        return list(itertools.product(*params))
+    return [(value,) for value in params]
+
+def _format_params(params):
+    return f"({', '.join(repr(p) for p in params)})" if params else ""
+
+def _format_value(value):
+    for scale, suffix in ((1, "s"), (1e-3, "ms"), (1e-6, "us")):
+        if value >= scale:
+            return f"{value / scale:.3g}{suffix}"
+    return f"{value * 1e9:.3g}ns"
+
+def _run_subprocess(code):
+    root = os.path.dirname(BENCHMARKS_DIR)
+    env = dict(os.environ, PYTHONPATH = os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    output = subprocess.run([sys.executable, "-c", code], env = env, check = True, capture_output = True, text = True).stdout
+    return float(output.split()[-1])
+
+def _hysom_version():
+    import hysom
+    return hysom.__version__
+
+def _git_commit():
+    # Commit of the benchmarked HySOM, when it is imported from a git checkout
+    import hysom
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output = True, text = True, check = True,
+                              cwd = os.path.dirname(os.path.abspath(hysom.__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _machine_info():
+    import numpy, numba
+    return {"name": platform.node() or "unknown", "platform": platform.platform(), "processor": platform.processor(),
+            "cpu_count": os.cpu_count(), "python": platform.python_version(), "numpy": numpy.__version__,
+            "numba": numba.__version__, "numba_threads": numba.config.NUMBA_NUM_THREADS}
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Run the HySOM benchmarks or compare two result files.")
+    parser.add_argument("-b", "--bench", help = "only run benchmarks whose name matches this regular expression")
+    parser.add_argument("--quick", action = "store_true", help = "one repeat per benchmark instead of five")
+    parser.add_argument("-o", "--output", help = "result file (default: benchmarks/results/<machine>/<version>-<commit>.json)")
+    parser.add_argument("--compare", nargs = 2, metavar = ("OLD", "NEW"), help = "compare two result files")
+    parser.add_argument("--factor", type = float, default = 1.5, help = "ratio reported as a change by --compare (default: 1.5)")
+    args = parser.parse_args(argv)
+    if args.compare:
+        return 1 if compare(*args.compare, args.factor) else 0
+    run(args.bench, 1 if args.quick else 5, args.output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
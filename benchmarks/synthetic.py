@@ -0,0 +1,39 @@
+"""
+Synthetic hysteresis loops for benchmarking, so the suite does not depend on downloaded data.
+
+Loops are min-max normalized (discharge, concentration) sequences like the ones produced by
+`hysom.utils.preprocessing`, built from a few parametric shapes (clockwise, counterclockwise,
+figure eight and linear) with random amplitude, phase and noise.
+"""
+import numpy as np
+
+SHAPES = ("clockwise", "counterclockwise", "figure_eight", "linear")
+
+def make_loops(nsamples: int, seq_len: int = 100, seed: int = 0, dtype = np.float64) -> np.ndarray:
+    """
+    Generate `nsamples` normalized loops with shape `(nsamples, seq_len, 2)`.
+
+    The output only depends on the arguments, so every run and every version benchmarks the same data.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0.0, 1.0, seq_len)
+    shapes = rng.integers(0, len(SHAPES), nsamples)
+    phase = rng.uniform(0.05, 0.35, (nsamples, 1))
+    skew = rng.uniform(0.5, 2.0, (nsamples, 1))
+
+    discharge = np.sin(np.pi * t[None, :] ** skew)
+    lag = np.where(shapes[:, None] == 0, -phase, phase)
+    concentration = np.sin(np.pi * np.clip(t[None, :] + lag, 0.0, 1.0) ** skew)
+    eight = shapes == 2
+    concentration[eight] = np.sin(2 * np.pi * t[None, :] + phase[eight]) * 0.5 + discharge[eight]
+    linear = shapes == 3
+    concentration[linear] = discharge[linear]
+
+    loops = np.stack((discharge, concentration), axis = -1)
+    loops += rng.normal(0.0, 0.01, loops.shape)
+    mins, maxs = loops.min(axis = 1, keepdims = True), loops.max(axis = 1, keepdims = True)
+    return ((loops - mins) / (maxs - mins)).astype(dtype)
+
+def make_prototypes(height: int, width: int, seq_len: int = 100, seed: int = 1, dtype = np.float64) -> np.ndarray:
+    """Prototypes with shape `(height, width, seq_len, 2)`, drawn from `make_loops`."""
+    return make_loops(height * width, seq_len, seed, dtype).reshape(height, width, seq_len, 2)
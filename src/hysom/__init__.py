@@ -1,7 +1,30 @@
-from hysom.hysom import HSOM
 from importlib.metadata import version, PackageNotFoundError
+import importlib
 
 try:
     __version__ = version("hysom")
 except PackageNotFoundError:
-    __version__ = "unknown"
\ No newline at end of file
+    __version__ = "unknown"
+
+# Names imported on first access, so that `import hysom` (or a submodule such as `hysom.utils.datasets`) 
+# does not import numba until a SOM is actually needed
+_lazy_attributes = {"HSOM": "hysom.hysom",
+                    "warmup": "hysom.hysom",
+                    }
+
+# Submodules that `import hysom` used to import eagerly, still reachable as attributes (e.g. `hysom.hysom`)
+_lazy_submodules = ("hysom", "train_functions", "validators", "schedule", "projection", "utils")
+
+__all__ = ["HSOM", "warmup"]
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        value = getattr(importlib.import_module(_lazy_attributes[name]), name)
+        globals()[name] = value
+        return value
+    if name in _lazy_submodules:
+        return importlib.import_module(f"hysom.{name}")
+    raise AttributeError(f"module 'hysom' has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes) | set(_lazy_submodules))
@@ -0,0 +1,238 @@
+import numpy as np
+import multiprocessing as mp
+from abc import ABC, abstractmethod
+from typing import Union, Callable, Sequence
+from hysom.hysom import HSOM, decay_functions_map, neighborhood_functions_map, distance_functions_map
+from hysom.validators import validate_window, validate_option, validate_non_negative, validate_batch_neighborhood
+from hysom.utils.aux_funcs import resolve_function, function_name
+
+class ShardBackend(ABC):
+    """
+    Transport between `train_sharded` and the processes that hold the data shards.
+
+    Each shard holder keeps an `HSOM` replica built from the configuration given to `configure`.
+    Every epoch, `accumulate` sends the current prototypes and neighborhood radius to all shards and
+    returns one `(numerator, denominator, distances_sum, nsamples)` tuple per shard, where numerator and
+    denominator are the batch SOM accumulators of the shard (see `HSOM._batch_accumulators`).
+    The reduction of these tuples is done by `train_sharded`, so a backend only needs to move arrays.
+    Subclasses can implement other transports (e.g. MPI or a cluster scheduler) and must
+    implement `configure`, `accumulate` and `sample`.
+    """
+    @abstractmethod
+    def configure(self, config: dict):
+        """Build the `HSOM` replica of every shard from `config` (see `replica_config`)."""
+
+    @abstractmethod
+    def accumulate(self, prototypes: np.ndarray, sigma: float) -> list[tuple]:
+        """Return the batch accumulators of every shard for the given prototypes and radius."""
+
+    @abstractmethod
+    def sample(self, size: int, rng: np.random.Generator) -> np.ndarray:
+        """Draw `size` samples from the first shard, used to initialize prototypes."""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class MultiprocessingBackend(ShardBackend):
+    """
+    Local backend with one `multiprocessing` worker per shard.
+
+    Workers are started with the "spawn" method, so scripts that create the backend (or call `train_sharded`
+    with shards) must guard their entry point with `if __name__ == "__main__":`.
+
+    Parameters
+    ----------
+    shards : sequence of np.ndarray or str
+        Data shards, each with shape `(nsamples, seq_len, 2)`. Arrays are sent to their worker once at
+        start-up. Paths to `.npy` files are memory-mapped by the worker itself, so the coordinator never
+        loads them.
+    """
+    def __init__(self, shards: Sequence[Union[np.ndarray, str]]):
+        self._shards = list(shards)
+        self._connections = []
+        self._processes = []
+        # Workers are spawned, not forked: forking after numba has started its threading layer (e.g. after a 
+        # previous `train`) leaves the parent hanging at exit
+        ctx = mp.get_context("spawn")
+        for shard in self._shards:
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target = _shard_worker, args = (child_conn, shard), daemon = True)
+            process.start()
+            child_conn.close()
+            self._connections.append(parent_conn)
+            self._processes.append(process)
+
+    def configure(self, config):
+        self._broadcast(("configure", config))
+
+    def accumulate(self, prototypes, sigma):
+        return self._broadcast(("accumulate", prototypes, sigma))
+
+    def sample(self, size, rng):
+        return rng.choice(_load_shard(self._shards[0]), size, replace = False)
+
+    def close(self):
+        for conn in self._connections:
+            try:
+                conn.send(("close",))
+                conn.close()
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+
+    def _broadcast(self, message):
+        for conn in self._connections:
+            conn.send(message)
+        replies = [conn.recv() for conn in self._connections]
+        for reply in replies:
+            if isinstance(reply, Exception):
+                raise reply
+        return replies
+
+def train_sharded(som: HSOM,
+                  shards: Union[Sequence[Union[np.ndarray, str]], ShardBackend],
+                  epochs: int,
+                  initial_sigma: float | None = None,
+                  final_sigma: float = 0.3,
+                  decay_sigma_func: Union[str, Callable] = "power",
+                  neighborhood_function: Union[str, Callable] = "gaussian",
+                  neighborhood_cutoff: float = 0.0,
+                  distance_function: Union[str, Callable] = "dtw",
+                  window: int | float | None = None,
+                  bmu_search: str = "pruned",
+                  verbose: bool = False) -> HSOM:
+    """
+    Data-parallel batch training of `som` over data shards held by separate processes.
+
+    Every epoch, each shard computes the BMUs of its samples and its neighborhood-weighted accumulators;
+    the accumulators are summed and the prototypes are replaced by the weighted mean, as in
+    `HSOM.train(..., algorithm="batch")`. Only prototypes and accumulators travel between processes.
+
+    Parameters
+    ----------
+    som : HSOM
+        Map to train. If its prototypes are not initialized, they are drawn from the first shard.
+
+    shards : sequence of np.ndarray or str, or ShardBackend
+        Data shards (arrays or paths to `.npy` files), or a backend that already holds them.
+        When shards are given, a `MultiprocessingBackend` with one worker per shard is used.
+
+    epochs : int
+        Number of epochs.
+
+    initial_sigma, final_sigma, decay_sigma_func, neighborhood_function, neighborhood_cutoff, distance_function, window, bmu_search
+        Same as in `HSOM.train` with `algorithm="batch"` (`"mexican_hat"` is not supported).
+        Custom callables must be picklable (module level functions).
+
+    verbose : bool, optional (default=False)
+        If True, the average quantization error is printed after each epoch.
+
+    Returns
+    -------
+    HSOM
+        The trained `som`. The average quantization error of each epoch, computed from the BMU search,
+        is available through `get_QE_history()`.
+    """
+    if not isinstance(epochs, int) or epochs <= 0:
+        raise ValueError("epochs must be a positive integer")
+    validate_window(window)
+    validate_option(bmu_search, ("pruned", "exhaustive"), "bmu_search")
+    validate_non_negative(neighborhood_cutoff, "neighborhood_cutoff")
+    validate_batch_neighborhood(neighborhood_function)
+
+    som.initial_sigma = np.sqrt(som.width * som.height) if initial_sigma is None else initial_sigma
+    som.final_sigma = final_sigma
+    som.decay_sigma_func = resolve_function(decay_sigma_func, decay_functions_map)
+    som.neighborhood_function = resolve_function(neighborhood_function, neighborhood_functions_map)
+    som.neighborhood_cutoff = neighborhood_cutoff
+    som.distance_function = resolve_function(distance_function, distance_functions_map)
+    som.window = window
+    som.bmu_search = bmu_search
+
+    backend = shards if isinstance(shards, ShardBackend) else MultiprocessingBackend(shards)
+    try:
+        if som._prototypes is None:
+            som.random_init(backend.sample(som.width * som.height, som._rng))
+        som._check_trainable()
+        backend.configure(replica_config(som))
+
+        nsamples_seen = 0
+        for epoch in range(epochs):
+            sigma = som.decay_sigma_func(som.initial_sigma, epoch, epochs, som.final_sigma)
+            numerator, denominator, distances_sum, nsamples = reduce_accumulators(backend.accumulate(som._prototypes, sigma))
+            som._set_batch_prototypes(numerator, denominator)
+            som._QE.append((nsamples_seen, float(distances_sum / nsamples)))
+            nsamples_seen += nsamples
+            if verbose:
+                print(f"Epoch: {epoch+1}/{epochs} - Quant. Error: {som._QE[-1][1]:.2f}")
+    finally:
+        if backend is not shards:
+            backend.close()
+    return som
+
+def reduce_accumulators(partials):
+    """Sum the per-shard `(numerator, denominator, distances_sum, nsamples)` tuples."""
+    numerator, denominator, distances_sum, nsamples = partials[0]
+    numerator, denominator = numerator.copy(), denominator.copy()
+    for partial in partials[1:]:
+        numerator += partial[0]
+        denominator += partial[1]
+        distances_sum += partial[2]
+        nsamples += partial[3]
+    return numerator, denominator, distances_sum, nsamples
+
+def replica_config(som):
+    """Settings needed to rebuild `som` in a shard process. Built-in functions are given by name."""
+    return {"width": som.width,
+            "height": som.height,
+            "input_dim": som.input_dim,
+            "dtype": som.dtype,
+            "neighborhood_function": function_name(som.neighborhood_function, neighborhood_functions_map) or som.neighborhood_function,
+            "neighborhood_cutoff": som.neighborhood_cutoff,
+            "distance_function": function_name(som.distance_function, distance_functions_map) or som.distance_function,
+            "window": som.window,
+            "bmu_search": som.bmu_search,
+            }
+
+def shard_accumulators(replica, shard, prototypes, sigma):
+    """Accumulators of one shard, as returned by `ShardBackend.accumulate`."""
+    replica.set_init_prototypes(prototypes)
+    numerator, denominator, _, distances = replica._batch_accumulators(shard, sigma)
+    return numerator, denominator, float(distances.sum()), len(shard)
+
+def _load_shard(shard):
+    if isinstance(shard, str):
+        return np.load(shard, mmap_mode = "r")
+    return shard
+
+def _shard_worker(conn, shard):
+    shard = _load_shard(shard)
+    replica = None
+    while True:
+        message = conn.recv()
+        try:
+            if message[0] == "close":
+                break
+            if message[0] == "configure":
+                config = dict(message[1])
+                replica = HSOM(config.pop("width"), config.pop("height"), config.pop("input_dim"), dtype = config.pop("dtype"))
+                config["neighborhood_function"] = resolve_function(config["neighborhood_function"], neighborhood_functions_map)
+                config["distance_function"] = resolve_function(config["distance_function"], distance_functions_map)
+                for attr, value in config.items():
+                    setattr(replica, attr, value)
+                conn.send(None)
+            else:
+                _, prototypes, sigma = message
+                conn.send(shard_accumulators(replica, shard, prototypes, sigma))
+        except Exception as error:
+            conn.send(error)
+    conn.close()
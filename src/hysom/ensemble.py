@@ -0,0 +1,123 @@
+import os
+import time
+import itertools
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+from hysom.hysom import HSOM
+
+# Keys of a configuration passed to the HSOM constructor. Any other key is passed to `HSOM.train`
+som_params = ("width", "height", "random_seed", "dtype")
+
+def train_many(data: np.ndarray,
+               configs: list[dict],
+               n_jobs: int | None = None,
+               threads_per_worker: int = 1,
+               random_seed: int | None = None,
+               **train_params) -> list[dict]:
+    """
+    Train several SOMs on the same data in parallel worker processes.
+
+    `data` is copied once into shared memory and every worker reads it from there, so it is not
+    pickled for each configuration. Workers are started with the "spawn" method, so scripts calling
+    `train_many` must guard their entry point with `if __name__ == "__main__":`.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        Training data with shape `(nsamples, seq_len, 2)`.
+
+    configs : list of dict
+        One dictionary per SOM. `"width"` and `"height"` are required; `"random_seed"` and `"dtype"` are passed
+        to `HSOM`, and every other key (e.g. `"epochs"`, `"initial_sigma"`, `"decay_sigma_func"`) is passed to
+        `HSOM.train`. Function options must be given as strings or as picklable (module level) callables.
+        See `config_grid` to build a grid of configurations.
+
+    n_jobs : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+
+    threads_per_worker : int, optional (default=1)
+        Number of numba threads used by each worker. Keeping `n_jobs * threads_per_worker` close to the
+        number of CPUs avoids oversubscription.
+
+    random_seed : int, optional
+        Seed used to derive reproducible seeds for configurations without a `"random_seed"` key.
+
+    **train_params
+        Training parameters shared by all configurations. Values in `configs` take precedence.
+
+    Returns
+    -------
+    list of dict
+        One dictionary per configuration, in the same order as `configs`, with keys:
+
+            - `"config"`: the configuration, including the seed that was used.
+            - `"som"`: the trained `HSOM`.
+            - `"QE"`, `"TE"`: error histories as returned by `get_QE_history()` and `get_TE_history()`.
+            - `"time"`: wall-clock training time in seconds.
+    """
+    data = np.ascontiguousarray(data)
+    configs = _seed_configs(configs, random_seed)
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    shm = shared_memory.SharedMemory(create = True, size = max(1, data.nbytes))
+    try:
+        np.ndarray(data.shape, dtype = data.dtype, buffer = shm.buf)[...] = data
+        initargs = (shm.name, data.shape, data.dtype.str, threads_per_worker)
+        # Spawned workers: forking after numba has started its threading layer leaves the parent hanging at exit
+        with ProcessPoolExecutor(max_workers = min(n_jobs, len(configs)) or 1, mp_context = multiprocessing.get_context("spawn"),
+                                 initializer = _init_worker, initargs = initargs) as pool:
+            results = list(pool.map(_train_config, [{**train_params, **config} for config in configs]))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    for result, config in zip(results, configs):
+        result["config"] = config
+    return results
+
+def config_grid(**params) -> list[dict]:
+    """
+    Build the cartesian product of parameter values.
+
+    Examples
+    --------
+    >>> config_grid(width = [6, 8], height = [6, 8], initial_sigma = [2.0, 4.0])
+    [{'width': 6, 'height': 6, 'initial_sigma': 2.0}, {'width': 6, 'height': 6, 'initial_sigma': 4.0}, ...]
+    """
+    keys = list(params)
+    return [dict(zip(keys, values)) for values in itertools.product(*params.values())]
+
+def _seed_configs(configs, random_seed):
+    seeds = np.random.SeedSequence(random_seed).generate_state(len(configs))
+    return [config if "random_seed" in config else {**config, "random_seed": int(seed)}
+            for config, seed in zip(configs, seeds)]
+
+# Worker side. The shared data is attached once per process by the pool initializer
+_worker_data = None
+_worker_shm = None
+
+def _init_worker(name, shape, dtype, threads):
+    global _worker_data, _worker_shm
+    import numba
+    numba.set_num_threads(min(threads, numba.config.NUMBA_NUM_THREADS))
+    _worker_shm = attach_shared_memory(name)
+    _worker_data = np.ndarray(shape, dtype = np.dtype(dtype), buffer = _worker_shm.buf)
+
+def _train_config(params):
+    som_kwargs = {key: params.pop(key) for key in som_params if key in params}
+    som = HSOM(input_dim = _worker_data.shape[1:], **som_kwargs)
+    start = time.perf_counter()
+    som.train(_worker_data, **params)
+    elapsed = time.perf_counter() - start
+    return {"som": som, "QE": som.get_QE_history(), "TE": som.get_TE_history(), "time": elapsed}
+
+def attach_shared_memory(name):
+    # Attach to an existing block without letting this process' resource tracker unlink it at exit
+    try:
+        return shared_memory.SharedMemory(name = name, track = False)
+    except TypeError: # Python < 3.13
+        shm = shared_memory.SharedMemory(name = name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
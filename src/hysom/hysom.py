@@ -1,9 +1,24 @@
+import io
+import os
+import json
+import time
+import contextlib
+import weakref
+import warnings
 import numpy as np
-from typing import Union, Tuple, List, Callable
-from collections import defaultdict
-from hysom.validators import validate_train_params, validate_prototypes_initialization
-from hysom.train_functions import decay_linear, decay_power, gaussian, bubble, euclidean, dtw
-from hysom.utils.aux_funcs import resolve_function
+from typing import Union, Tuple, List, Callable, Iterable
+from collections import defaultdict, OrderedDict
+from hysom.validators import validate_train_params, validate_prototypes_initialization, validate_window, validate_option, validate_dtype, validate_non_negative
+from hysom.validators import validate_stream_params, validate_chunk_size, validate_k, validate_checkpoint_params, validate_batch_neighborhood
+from hysom.train_functions import decay_linear, decay_power, gaussian, bubble, cutoff_gaussian, mexican_hat, euclidean, dtw, dtw_batch
+from hysom.train_functions import flatten_prototypes, euclidean_gemm, njit_euclidean
+from hysom.train_functions import dtw_envelopes, dtw_bmu, dtw_bmu_batch, dtw_k_bmus_batch, batch_accumulate
+from hysom.train_functions import offset_grid_distances, distances_window, neighborhood_values
+from hysom.train_functions import online_train, DISTANCE_DTW, DISTANCE_EUCLIDEAN
+from hysom.train_functions import NEIGHBORHOOD_GAUSSIAN, NEIGHBORHOOD_BUBBLE, NEIGHBORHOOD_CUTOFF_GAUSSIAN, NEIGHBORHOOD_MEXICAN_HAT
+from hysom.utils.aux_funcs import resolve_function, resolve_window, function_name, load_samples, ChunkProgress, save_npz, npz_memmap
+from hysom.schedule import TrainingSchedule, decay_values
+from hysom.projection import Projection
 
 decay_functions_map = {"power": decay_power,
                     "linear": decay_linear,
@@ -11,12 +26,34 @@ decay_functions_map = {"power": decay_power,
 
 neighborhood_functions_map = {"gaussian": gaussian,
                           "bubble": bubble,
+                          "cutoff_gaussian": cutoff_gaussian,
+                          "mexican_hat": mexican_hat,
                           }
 
 distance_functions_map = {"euclidean": euclidean,
                       "dtw": dtw
                       }
 
+# HSOM attributes holding functions that can be given by name
+function_attributes_maps = {"decay_sigma_func": decay_functions_map,
+                            "decay_learning_rate_func": decay_functions_map,
+                            "neighborhood_function": neighborhood_functions_map,
+                            "distance_function": distance_functions_map,
+                            }
+
+# Built-in functions supported by the compiled training engine
+jit_codes_map = {gaussian: NEIGHBORHOOD_GAUSSIAN,
+                 bubble: NEIGHBORHOOD_BUBBLE,
+                 cutoff_gaussian: NEIGHBORHOOD_CUTOFF_GAUSSIAN,
+                 mexican_hat: NEIGHBORHOOD_MEXICAN_HAT,
+                 dtw: DISTANCE_DTW,
+                 euclidean: DISTANCE_EUCLIDEAN,
+                 }
+
+def _describe_function(func, func_map):
+    # Name of a built-in function, or qualified name of a custom one
+    return function_name(func, func_map) or f"{func.__module__}.{func.__qualname__}"
+
 class HSOM:
     """
     Self-Organizing Map (SOM) for 2D time series data.
@@ -36,23 +73,70 @@ class HSOM:
     random_seed : int, optional
         Ensures reproducibility. If None, results may vary each time due to random elements 
         in the training process. Default is None.
+
+    dtype : np.float32 or np.float64, optional
+        Floating point precision of the prototypes, the neighborhood values and the distance kernels. 
+        Data passed to the SOM is converted to this precision. Default is `np.float64`.  
+        `np.float32` halves the memory used by prototypes, data and distance buffers. The accuracy 
+        impact is negligible for normalized loops: on the sample loops (`get_labeled_loops`), a 6x6 SOM 
+        trained in `np.float32` reaches the same TE and a QE that differs by less than 0.001%, and the 
+        General T-Q SOM in `np.float32` assigns every loop to the same BMU, with distances within 1e-6.
     """
     def __init__(self,
                 width: int,
                 height: int,
                 input_dim: tuple,
-                random_seed: int | None | None= None
+                random_seed: int | None | None= None,
+                dtype: type = np.float64
                 ):
 
+        validate_dtype(dtype)
+
         self.width = width
         self.height = height
         self.input_dim = input_dim
         self.random_seed = random_seed
-        self._grid = np.meshgrid(np.arange(self.height), np.arange(self.width), indexing="ij")
+        self.dtype = np.dtype(dtype)
+        self._grid = tuple(np.meshgrid(np.arange(self.height), np.arange(self.width), indexing="ij"))
+        self._offset_distances = offset_grid_distances(self.height, self.width)
         self._rng = np.random.default_rng(self.random_seed)
+        # Subsets for error monitoring have their own stream, so tracking errors does not change the trained map
+        self._errors_rng = np.random.default_rng(np.random.SeedSequence(self.random_seed).spawn(1)[0])
         self._TE = []
         self._QE = []
         self._prototypes = None
+        self._prototypes_version = 0
+        self._iteration = 0
+        self._max_iter = None # `max_iter` of the `partial_fit` run, fixed by its first call
+        self._training_state = None
+        self._envelopes = None
+        self._envelopes_key = None
+        self._flat_prototypes = None
+        self._flat_prototypes_version = None
+        self._projections = OrderedDict()
+        self._projections_state = None
+        self.projection_cache_size = 8
+        self.window = None
+        self.bmu_search = "pruned"
+        self.neighborhood_cutoff = 0.0
+
+    def __getstate__(self):
+        # Built-in functions are pickled by name. Compiled functions do not keep their identity across 
+        # processes, and the fast paths of HSOM rely on it
+        state = self.__dict__.copy()
+        state["_projections"] = OrderedDict()
+        state["_projections_state"] = None
+        for attr, func_map in function_attributes_maps.items():
+            name = function_name(state.get(attr), func_map)
+            if name is not None:
+                state[attr] = name
+        return state
+
+    def __setstate__(self, state):
+        for attr, func_map in function_attributes_maps.items():
+            if isinstance(state.get(attr), str):
+                state[attr] = func_map[state[attr]]
+        self.__dict__.update(state)
 
     def random_init(self, data: np.ndarray):
 
@@ -80,10 +164,14 @@ class HSOM:
         """
 
         validate_prototypes_initialization(self.width, self.height, self.input_dim, prototypes)
-        self._prototypes = prototypes
+        self._prototypes = np.asarray(prototypes, dtype = self.dtype)
+        self._prototypes_version += 1
+        self._iteration = 0
+        self._max_iter = None
 
     def train(self, data: np.ndarray, 
               epochs: int, 
+              algorithm: str = "online",
               random_order: bool = True,
               initial_sigma: float | None= None,
               initial_learning_rate: float = 1.0,
@@ -92,11 +180,18 @@ class HSOM:
               decay_sigma_func: Union[str, Callable]= "power",
               decay_learning_rate_func: Union[str, Callable]=  "power",
               neighborhood_function: Union[str, Callable]= "gaussian",
+              neighborhood_cutoff: float = 0.0,
               distance_function: Union[str, Callable] = "dtw", 
-              track_errors: bool = False, 
+              window: int | float | None = None,
+              bmu_search: str = "pruned",
+              engine: str = "auto",
+              track_errors: bool | str = False, 
               errors_sampling_rate: int = 4, 
               errors_data_fraction: float = 1.0,
-              verbose: bool | int| int= False
+              verbose: bool | int| int= False,
+              checkpoint_path: str | None = None,
+              checkpoint_every: int = 1,
+              resume: bool = False
               ):
         """
         Trains the Self-Organizing Map (SOM).
@@ -109,6 +204,17 @@ class HSOM:
         epochs : int
             Defines the number of training iterations (`total_iterations = number_of_samples * epochs`). Each data sample is fed to the map once every epoch.
 
+        algorithm : str, optional (default="online")
+            Training algorithm.   
+
+            Available options: `"online"`, `"batch"`.   
+
+            `"online"` updates the prototypes after each sample. `"batch"` computes the BMUs of all samples 
+            in a single pass each epoch and replaces every prototype by the neighborhood-weighted mean of the data. 
+            In batch mode the neighborhood radius decays once per epoch (from `initial_sigma` to `final_sigma`), 
+            the learning rate parameters and `random_order` are ignored and errors are tracked once per epoch.  
+            Batch training is typically much faster and needs fewer epochs than online training.
+
         random_order : bool, optional (default=True)
             If True, samples are picked randomly without replacement. If False, they are fed sequentially.
         
@@ -150,7 +256,15 @@ class HSOM:
         neighborhood_function : str or callable, optional (default: "gaussian")
             Defines the neighborhood function.   
 
-            Available options: `"gaussian"`, `"bubble"`.  
+            Available options: `"gaussian"`, `"bubble"`, `"cutoff_gaussian"`, `"mexican_hat"`.  
+
+                - `"gaussian"`: `exp(-d**2 / (2 * sigma**2))`, where `d` is the grid distance to the BMU.
+                - `"bubble"`: 1.0 for units within `sigma` of the BMU and 0.0 elsewhere.
+                - `"cutoff_gaussian"`: `"gaussian"` truncated to zero beyond `sigma`.
+                - `"mexican_hat"`: `(1 - d**2 / sigma**2) * exp(-d**2 / (2 * sigma**2))`. Negative values push distant prototypes away from the sample.
+                  Not available with `algorithm="batch"`.
+
+            Built-in functions are evaluated on grid distances precomputed once per map.  
             If callable, the function should accept three arguments:
 
                 - `grid` (tuple of numpy arrays): Coordinate matrices as returned by `numpy.meshgrid` using matrix indexing convention:  
@@ -160,6 +274,12 @@ class HSOM:
             The function should return a matrix of neighborhood values with shape `(width, height)`.
             See the Tutorials for additional details
 
+        neighborhood_cutoff : float, optional (default=0.0)
+            Units whose absolute neighborhood value is not greater than `neighborhood_cutoff` are not updated.
+            Late in training, when sigma is small, a cutoff such as `1e-3` restricts each update to a few units 
+            around the BMU. With the default value only units with a neighborhood value of exactly zero are skipped, 
+            which does not change the results.
+
         distance_function : str or callable, optional (default: "dtw")
             Defines the distance function used to identify the BMU.  
 
@@ -172,44 +292,116 @@ class HSOM:
 
             The function should return an `np.array` of shape (`width`, `height`, `seq_len`, 2)  containing the distance from `sample` to each prototype
 
-        track_errors : bool, optional (default=False)
-            If True, quantization error (QE) and topographic error (TE) will be computed during training. These values can be accessed using `get_QE_history()` and `get_TE_history()`.
+        window : int or float, optional (default=None)
+            Sakoe-Chiba band used to constrain the `"dtw"` distance: only alignments where the indices of 
+            both sequences differ by at most `window` points are evaluated. If float (between 0 and 1), 
+            it is interpreted as a fraction of `seq_len` (e.g. `0.1` for a 10% band). If None, the full 
+            cost matrix is evaluated. Narrow bands make BMU search much faster.
+            Ignored for other distance functions.
+
+        bmu_search : str, optional (default="pruned")
+            Strategy used to find the BMU when `distance_function` is `"dtw"`.   
+
+            Available options: `"pruned"`, `"exhaustive"`.   
+
+            `"pruned"` visits prototypes by increasing lower bound (LB_Kim and LB_Keogh) and abandons 
+            DTW computations as soon as they exceed the best distance found so far. It returns exactly 
+            the same BMU as `"exhaustive"`, which computes the DTW distance to every prototype. 
+            Pruning is most effective when combined with a narrow `window`.
+
+        engine : str, optional (default="auto")
+            Execution engine for online training.   
+
+            Available options: `"auto"`, `"jit"`, `"python"`.   
+
+            `"jit"` runs BMU search, neighborhood evaluation and prototype updates for a whole epoch in a single 
+            compiled function, which removes the per-sample Python overhead. It only supports the built-in 
+            neighborhood and distance functions and produces the same prototypes as `"python"`.
+            `"python"` runs the training loop in Python and accepts custom callables. 
+            `"auto"` selects `"jit"` whenever the neighborhood and distance functions are built-in. 
+            Ignored when `algorithm="batch"`.
+
+        track_errors : bool or str, optional (default=False)
+            If True, quantization error (QE) and topographic error (TE) will be computed during training. These values can be accessed using `get_QE_history()` and `get_TE_history()`.  
+            If `"online"`, QE and TE are not computed in an extra pass over the data but estimated from the BMU search 
+            of the training samples themselves: each recorded value is the average error of the samples fed since the 
+            previous record, measured against the prototypes as they were when each sample was fed. The estimates are 
+            nearly free (only the second BMU is searched in addition) but lag slightly behind the current prototypes.
+            In batch training, the online estimates of an epoch are recorded at its start, before the prototypes are updated.
 
         errors_sampling_rate : int, optional (default=4)
-            If `track_errors` is True, this parameter controls how often errors are tracked. Errors will be tracked `errors_sampling_rate` times per epoch.            
+            If `track_errors` is True or `"online"`, this parameter controls how often errors are tracked. Errors will be tracked `errors_sampling_rate` times per epoch.            
 
         errors_data_fraction : float, optional (default=1.0)
             If `track_errors` is True, this parameter specifies the fraction of the data used to compute errors. 
             It should be between 0 and 1.0 (inclusive). If set to 1.0, all samples are used; if set to a value less than 1.0, the calculation is faster but uses fewer samples.
+            Ignored when `track_errors="online"`.
 
         verbose : bool or int, optional (default=False)
             If True, the status of the training process will be printed each epoch. 
             If int, this value represents the approximate number of times the status of the training process will be printed each epoch. 
 
+        checkpoint_path : str, optional (default=None)
+            If given, the map is saved to this path (see `save`) every `checkpoint_every` epochs and at the end of training.
+            The file is replaced atomically, so an interruption never leaves a corrupted checkpoint.
+
+        checkpoint_every : int, optional (default=1)
+            Number of epochs between checkpoints.
+
+        resume : bool, optional (default=False)
+            If True, an interrupted training run is continued from its last completed epoch instead of starting over.
+            Load the last checkpoint with `HSOM.load` and call `train` with the same data and parameters as the interrupted run 
+            (a `ValueError` is raised if they differ). The resumed run produces the same map as an uninterrupted one.
+
+            Examples
+            --------
+            >>> som.train(data, epochs = 50, checkpoint_path = "som.npz")  # interrupted
+            >>> som = HSOM.load("som.npz")
+            >>> som.train(data, epochs = 50, checkpoint_path = "som.npz", resume = True)
+
         """
-        
-        if initial_sigma is None:
-            initial_sigma = np.sqrt(self.width * self.height)
 
         validate_train_params(data, epochs,errors_sampling_rate, errors_data_fraction, verbose)
-        
-        self.initial_sigma = initial_sigma
-        self.initial_learning_rate = initial_learning_rate
-        self.final_sigma = final_sigma
-        self.final_learning_rate = final_learning_rate
-        self.decay_sigma_func = resolve_function(decay_sigma_func, decay_functions_map)
-        self.decay_learning_rate_func = resolve_function(decay_learning_rate_func, decay_functions_map)
-        self.neighborhood_function = resolve_function(neighborhood_function, neighborhood_functions_map)
-        self.distance_function = resolve_function(distance_function, distance_functions_map)
+        validate_checkpoint_params(checkpoint_path, checkpoint_every)
+        validate_option(algorithm, ("online", "batch"), "algorithm")
+        validate_option(engine, ("auto", "jit", "python"), "engine")
+        validate_option(track_errors, (False, True, "online"), "track_errors")
+        if algorithm == "batch":
+            validate_batch_neighborhood(neighborhood_function)
+        params = self._training_params(initial_sigma, initial_learning_rate, final_sigma, final_learning_rate,
+                                       decay_sigma_func, decay_learning_rate_func, neighborhood_function, neighborhood_cutoff,
+                                       distance_function, window, bmu_search)
+        data = np.asarray(data, dtype = self.dtype)
         nsamples = len(data)
-
-        if self._prototypes is None:
+        # Read-only (e.g. shared pretrained) maps are rejected before any of their settings change
+        if not resume and self._prototypes is None:
             self.random_init(data)
+        self._check_trainable()
+        self._set_training_params(params)
+
+        # Parameters that determine the result of the run, checked when it is resumed
+        run_params = {"nsamples": nsamples, "algorithm": algorithm, "random_order": random_order,
+                      "initial_sigma": float(self.initial_sigma), "initial_learning_rate": initial_learning_rate,
+                      "final_sigma": final_sigma, "final_learning_rate": final_learning_rate,
+                      "neighborhood_cutoff": neighborhood_cutoff, "window": window, "track_errors": track_errors, 
+                      "errors_sampling_rate": errors_sampling_rate, "errors_data_fraction": errors_data_fraction}
+        for attr, func_map in function_attributes_maps.items():
+            run_params[attr] = _describe_function(getattr(self, attr), func_map)
+
+        if resume:
+            start_epoch = self._resume_epoch(epochs, run_params)
+        else:
+            start_epoch = 0
+            self._training_state = {"epoch": 0, "epochs": epochs, "params": run_params}
 
-        if track_errors is False:
+        online_errors = track_errors == "online"
+        track_errors = bool(track_errors) and not online_errors # errors computed on a subset of the data
+        nsamples_error = None
+        if not (track_errors or online_errors):
             samples_per_error = nsamples + 1 # out of reach value
         else:
             samples_per_error = max(1, int(nsamples / errors_sampling_rate))
+        if track_errors:
             nsamples_error = max(1 , int(nsamples * errors_data_fraction))
         
         if verbose is False:
@@ -218,48 +410,395 @@ class HSOM:
             verbose = int(verbose)
             samples_per_print = max(1, int(nsamples / verbose))
 
-        # Iteration indices
-        max_iter, list_idxs = self._get_iteration_indices(epochs, random_order, nsamples)
+        if algorithm == "batch":
+            self._train_batch(data, epochs, track_errors, nsamples_error, online_errors, verbose, start_epoch, checkpoint_path, checkpoint_every)
+            return
+
+        # Sample order, learning rates and radii, generated one epoch at a time
+        schedule = TrainingSchedule(nsamples, epochs, random_order, self._rng,
+                                    self.initial_learning_rate, self.final_learning_rate, self.decay_learning_rate_func,
+                                    self.initial_sigma, self.final_sigma, self.decay_sigma_func)
+        use_jit = self._resolve_engine(engine)
 
         # Training loop
-        iter = 0
-        for epoch, idxs in enumerate(list_idxs):
+        iter = start_epoch * nsamples
+        for epoch, idxs, learning_rates, sigmas in schedule.epochs_from(start_epoch):
 
             if track_errors: # Compute errors before first iteration
                 self._track_errors(iter, data, nsamples_error)
             if verbose:
                 self._print_epoch_summary(epoch+1, epochs)
 
-            for inner_iter, idx in enumerate(idxs): 
-                sample = data[idx]
-                learning_rate = self.decay_learning_rate_func(self.initial_learning_rate, iter, max_iter, self.final_learning_rate)
-                sigma = self.decay_sigma_func(self.initial_sigma, iter, max_iter, self.final_sigma)
-                self._update(sample, learning_rate, sigma)
+            if use_jit:
+                self._train_epoch_jit(data, idxs, learning_rates, sigmas, iter, samples_per_error, samples_per_print, nsamples_error, online_errors)
+                iter += len(idxs)
+            else:
+                # Errors of every sample, measured during its BMU search
+                sample_errors = np.empty((2, nsamples if online_errors else 0))
+                for inner_iter, idx in enumerate(idxs): 
+                    sample = data[idx]
+                    if online_errors:
+                        units, distances = self._batch_k_bmus(sample[np.newaxis], 2)
+                        sample_errors[:, inner_iter] = distances[0, 0], self._topographic_errors(units)[0]
+                        bmu = tuple(int(x) for x in np.unravel_index(units[0, 0], (self.height, self.width)))
+                        self._update(sample, learning_rates[inner_iter], sigmas[inner_iter], bmu)
+                    else:
+                        self._update(sample, learning_rates[inner_iter], sigmas[inner_iter])
+
+                    if self._is_time_to_track_errors(inner_iter, samples_per_error):
+                        self._track_errors(iter, data, nsamples_error, self._errors_window(sample_errors, inner_iter, samples_per_error))
+                    
+                    if self._is_time_to_print_training_status(inner_iter, samples_per_print):
+                        self._print_training_status(inner_iter, nsamples)
+
+                    iter += 1
+            self._end_epoch(epoch, epochs, checkpoint_path, checkpoint_every)
+        self._print_finish_message()
 
-                if self._is_time_to_track_errors(inner_iter, samples_per_error):
-                    self._track_errors(iter, data, nsamples_error)
-                
-                if self._is_time_to_print_training_status(inner_iter, samples_per_print):
-                    self._print_training_status(inner_iter, nsamples)
+    def partial_fit(self, batch: np.ndarray,
+                    max_iter: int,
+                    random_order: bool = True,
+                    initial_sigma: float | None = None,
+                    initial_learning_rate: float = 1.0,
+                    final_sigma: float = 0.3,
+                    final_learning_rate: float = 0.01,
+                    decay_sigma_func: Union[str, Callable] = "power",
+                    decay_learning_rate_func: Union[str, Callable] = "power",
+                    neighborhood_function: Union[str, Callable] = "gaussian",
+                    neighborhood_cutoff: float = 0.0,
+                    distance_function: Union[str, Callable] = "dtw",
+                    window: int | float | None = None,
+                    bmu_search: str = "pruned",
+                    engine: str = "auto"
+                    ):
+        """
+        Online training on a batch of samples, continuing the training run of previous calls.
 
-                iter += 1
-        self._print_finish_message()
+        The map keeps the iteration counter (number of samples fed so far) and its random number generator 
+        between calls, so data can be fed in chunks as it arrives or as it is read from disk. Learning rate 
+        and neighborhood radius decay over `max_iter` iterations and stay at their final values afterwards.
+        Calling `partial_fit` once per epoch with the whole dataset and `max_iter = len(data) * epochs` 
+        gives the same prototypes as `train(data, epochs)`.
+
+        The iteration counter and `max_iter` are reset when prototypes are initialized (`set_init_prototypes`, `random_init`).
+
+        Parameters
+        ----------
+        batch : np.ndarray
+            Samples with shape `(nsamples,) + input_dim`. Memory-mapped arrays are accepted. If prototypes are not 
+            initialized, they are drawn from the first batch, which must then hold at least `width * height` samples.
+
+        max_iter : int
+            Total number of samples of the training run, used by the decay functions. Must be the same in every call;
+            a different value raises a ValueError until the prototypes are initialized again.
 
-    def _get_iteration_indices(self, epochs, random_order, nsamples):
-        max_iter = nsamples * epochs
-        list_idxs = [[i for i in range(nsamples)] for epoch in range(epochs)]
+        random_order : bool, optional (default=True)
+            If True, the samples of the batch are shuffled.
+
+        initial_sigma, initial_learning_rate, final_sigma, final_learning_rate, decay_sigma_func, decay_learning_rate_func, neighborhood_function, neighborhood_cutoff, distance_function, window, bmu_search, engine
+            Same as in `train`. They are applied to this batch only, so they are normally the same in every call.
+        """
+        validate_stream_params(batch, self.input_dim, max_iter)
+        validate_option(engine, ("auto", "jit", "python"), "engine")
+        if self._max_iter is not None and max_iter != self._max_iter:
+            raise ValueError(f"max_iter must be the same in every call of the training run: it started with {self._max_iter}, not {max_iter}. "
+                             "Initialize the prototypes again (`random_init`, `set_init_prototypes`) to start a new run")
+        params = self._training_params(initial_sigma, initial_learning_rate, final_sigma, final_learning_rate,
+                                       decay_sigma_func, decay_learning_rate_func, neighborhood_function, neighborhood_cutoff,
+                                       distance_function, window, bmu_search)
+        nsamples = len(batch)
+        if nsamples == 0:
+            return
+        batch = np.ascontiguousarray(batch, dtype = self.dtype)
+        if self._prototypes is None:
+            self.random_init(batch)
+        self._check_trainable()
+        self._set_training_params(params)
+
+        idxs = np.arange(nsamples, dtype = np.int32)
         if random_order:
-            [self._rng.shuffle(indices) for indices in list_idxs]
+            self._rng.shuffle(idxs)
+        iterations = np.minimum(np.arange(self._iteration, self._iteration + nsamples), max_iter)
+        learning_rates = decay_values(iterations, self.initial_learning_rate, self.final_learning_rate, self.decay_learning_rate_func, max_iter)
+        sigmas = decay_values(iterations, self.initial_sigma, self.final_sigma, self.decay_sigma_func, max_iter)
+
+        if self._resolve_engine(engine):
+            out_of_reach = nsamples + 1
+            self._train_epoch_jit(batch, idxs, learning_rates, sigmas, self._iteration, out_of_reach, out_of_reach, None)
+        else:
+            for idx, learning_rate, sigma in zip(idxs, learning_rates, sigmas):
+                self._update(batch[idx], learning_rate, sigma)
+        self._iteration += nsamples
+        self._max_iter = max_iter
 
-        return max_iter,list_idxs
-    
-    def _update(self, sample, learning_rate, sigma):
+    def train_stream(self, batches: Iterable[np.ndarray], max_iter: int, verbose: bool = False, **params):
+        """
+        Online training from an iterable of batches (e.g. a generator reading chunks of a large file).
+
+        Each batch is passed to `partial_fit`, so training can be resumed later with further calls.
+
+        Parameters
+        ----------
+        batches : iterable of np.ndarray
+            Batches of samples with shape `(nsamples,) + input_dim`.
+
+        max_iter : int
+            Total number of samples of the training run (see `partial_fit`). Must be the same as in earlier calls of the run.
+
+        verbose : bool, optional (default=False)
+            If True, the number of samples fed so far is printed after each batch.
+
+        **params
+            Training parameters passed to `partial_fit` (e.g. `initial_sigma`, `distance_function`, `window`).
+        """
+        for batch in batches:
+            self.partial_fit(batch, max_iter, **params)
+            if verbose:
+                print(f"[{self._iteration}/{max_iter}] {100 * self._iteration / max_iter:.0f}%")
+
+    def _training_params(self, initial_sigma, initial_learning_rate, final_sigma, final_learning_rate,
+                         decay_sigma_func, decay_learning_rate_func, neighborhood_function, neighborhood_cutoff,
+                         distance_function, window, bmu_search):
+        # Validated training settings by attribute name. Nothing is assigned, so the map is left unchanged 
+        # if a later check fails; `_set_training_params` applies them
+        validate_window(window)
+        validate_option(bmu_search, ("pruned", "exhaustive"), "bmu_search")
+        validate_non_negative(neighborhood_cutoff, "neighborhood_cutoff")
+
+        return {"initial_sigma": np.sqrt(self.width * self.height) if initial_sigma is None else initial_sigma,
+                "initial_learning_rate": initial_learning_rate,
+                "final_sigma": final_sigma,
+                "final_learning_rate": final_learning_rate,
+                "decay_sigma_func": resolve_function(decay_sigma_func, decay_functions_map),
+                "decay_learning_rate_func": resolve_function(decay_learning_rate_func, decay_functions_map),
+                "neighborhood_function": resolve_function(neighborhood_function, neighborhood_functions_map),
+                "neighborhood_cutoff": neighborhood_cutoff,
+                "distance_function": resolve_function(distance_function, distance_functions_map),
+                "window": window,
+                "bmu_search": bmu_search}
+
+    def _set_training_params(self, params):
+        for attr, value in params.items():
+            setattr(self, attr, value)
+
+    def _check_trainable(self):
+        if self._prototypes is not None and not self._prototypes.flags.writeable:
+            raise ValueError("The prototypes of this map are read-only (memory-mapped or shared) and cannot be trained. "
+                             "Train a copy instead, e.g. `som.set_init_prototypes(np.array(som.get_prototypes()))`")
+
+    def _resume_epoch(self, epochs, run_params):
+        # First epoch to train when resuming, after checking that the run is the one that was interrupted
+        state = self._training_state
+        if state is None:
+            raise ValueError("There is no training run to resume. Load a checkpoint saved with `train(..., checkpoint_path=...)` first")
+        if state["epochs"] != epochs:
+            raise ValueError(f"The interrupted run had {state['epochs']} epochs, not {epochs}")
+        changed = sorted(key for key in run_params if state["params"].get(key) != run_params[key])
+        if changed:
+            raise ValueError(f"Training parameters differ from those of the interrupted run: {changed}")
+        return state["epoch"]
+
+    def _end_epoch(self, epoch, epochs, checkpoint_path, checkpoint_every):
+        self._training_state["epoch"] = epoch + 1
+        if checkpoint_path is not None and ((epoch + 1) % checkpoint_every == 0 or epoch + 1 == epochs):
+            self.save(checkpoint_path)
+
+    def save(self, path: str):
+        """
+        Save the map to an uncompressed `.npz` file.
+
+        The file holds the prototypes as a binary array, plus a JSON header with the map configuration, 
+        the training parameters (built-in functions are stored by name), the state of the random number generator, 
+        the iteration counter of `partial_fit`, the QE/TE histories and the progress of the last training run.
+        The file is written to a temporary file first and then renamed, so it is never left half-written.
 
-        bmu = self.get_BMU(sample)
-        neighborhood_vals = self.neighborhood_function(self._grid, bmu, sigma)
-        reshaped_nv = neighborhood_vals.repeat(self.input_dim[0] * self.input_dim[1]).reshape(self.height, self.width, self.input_dim[0], self.input_dim[1])
-        self._prototypes += learning_rate * reshaped_nv * (sample - self._prototypes)
+        Custom (callable) functions cannot be saved; they must be passed again to `train` after loading.
+
+        Parameters
+        ----------
+        path : str
+            Destination file. The name is used as is (no `.npz` extension is appended).
+        """
+        metadata = {"format_version": 1,
+                    "width": self.width,
+                    "height": self.height,
+                    "input_dim": list(self.input_dim),
+                    "random_seed": self.random_seed,
+                    "dtype": self.dtype.name,
+                    "rng_state": self._rng.bit_generator.state,
+                    "errors_rng_state": self._errors_rng.bit_generator.state,
+                    "iteration": self._iteration,
+                    "max_iter": self._max_iter,
+                    "training_state": self._training_state,
+                    "QE": self._QE,
+                    "TE": self._TE,
+                    "projection_cache_size": self.projection_cache_size,
+                    "attributes": {}}
+        for attr in ("initial_sigma", "initial_learning_rate", "final_sigma", "final_learning_rate", 
+                     "neighborhood_cutoff", "window", "bmu_search"):
+            value = getattr(self, attr, None)
+            metadata["attributes"][attr] = float(value) if isinstance(value, np.floating) else value
+        for attr, func_map in function_attributes_maps.items():
+            func = getattr(self, attr, None)
+            name = function_name(func, func_map)
+            if func is not None and name is None:
+                warnings.warn(f"{attr} is a custom function and is not saved")
+            metadata["attributes"][attr] = name
+
+        arrays = {"metadata": np.array(json.dumps(metadata, default = lambda value: value.item()))} # NumPy scalars
+        if self._prototypes is not None:
+            arrays["prototypes"] = np.ascontiguousarray(self._prototypes)
+        save_npz(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str | None = None) -> "HSOM":
+        """
+        Load a map saved with `save` (or a checkpoint written by `train`).
+
+        Parameters
+        ----------
+        path : str
+            File written by `save`.
+
+        mmap_mode : str, optional (default=None)
+            If None, prototypes are read into memory. If `"r"`, they are memory-mapped read-only from the file, so 
+            several processes can share one copy for inference; such a map cannot be trained. With `"c"` (copy-on-write) 
+            the map can be trained without modifying the file.
+
+        Returns
+        -------
+        HSOM
+            The saved map, ready for inference or to continue training (see `train(..., resume=True)`).
+        """
+        validate_option(mmap_mode, (None, "r", "c"), "mmap_mode")
+        with np.load(path) as archive:
+            metadata = json.loads(str(archive["metadata"]))
+            has_prototypes = "prototypes" in archive.files
+            if has_prototypes and mmap_mode is None:
+                prototypes = archive["prototypes"]
+
+        som = cls(metadata["width"], metadata["height"], tuple(metadata["input_dim"]), 
+                  random_seed = metadata["random_seed"], dtype = np.dtype(metadata["dtype"]))
+        if has_prototypes:
+            if mmap_mode is not None:
+                prototypes = npz_memmap(path, "prototypes", mmap_mode)
+            som.set_init_prototypes(prototypes)
+        som._rng.bit_generator.state = metadata["rng_state"]
+        if "errors_rng_state" in metadata: # not in files saved by older versions
+            som._errors_rng.bit_generator.state = metadata["errors_rng_state"]
+        som._iteration = metadata["iteration"]
+        som._max_iter = metadata.get("max_iter") # not in files saved by older versions
+        som._training_state = metadata["training_state"]
+        som._QE = [tuple(record) for record in metadata["QE"]]
+        som._TE = [tuple(record) for record in metadata["TE"]]
+        som.projection_cache_size = metadata["projection_cache_size"]
+        for attr, value in metadata["attributes"].items():
+            if attr in function_attributes_maps:
+                value = None if value is None else function_attributes_maps[attr][value]
+            setattr(som, attr, value)
+        return som
+
+    def _resolve_engine(self, engine):
+        supported = self.neighborhood_function in jit_codes_map and self.distance_function in jit_codes_map
+        if engine == "jit" and not supported:
+            raise ValueError("engine 'jit' only supports the built-in neighborhood and distance functions")
+        return supported and engine != "python"
+
+    def _train_epoch_jit(self, data, idxs, learning_rates, sigmas, iter, samples_per_error, samples_per_print, nsamples_error, online_errors = False):
+        # The compiled loop runs between the points where errors are tracked or the training status is printed
+        nsamples = len(idxs)
+        sample_errors = np.empty((2, nsamples if online_errors else 0))
+        stops = set(range(samples_per_error, nsamples + 1, samples_per_error))
+        stops.update(range(samples_per_print, nsamples + 1, samples_per_print))
+        stops.add(nsamples)
+        start = 0
+        for stop in sorted(stops):
+            online_train(self._prototypes, data, idxs[start:stop], learning_rates[start:stop], sigmas[start:stop], self._offset_distances,
+                         jit_codes_map[self.neighborhood_function], self.neighborhood_cutoff, 
+                         jit_codes_map[self.distance_function], self._window_size(), self.bmu_search == "pruned",
+                         sample_errors[0, start:stop], sample_errors[1, start:stop])
+            self._prototypes_version += 1
+            inner_iter = stop - 1
+            if self._is_time_to_track_errors(inner_iter, samples_per_error):
+                self._track_errors(iter + inner_iter, data, nsamples_error, self._errors_window(sample_errors, inner_iter, samples_per_error))
+            if self._is_time_to_print_training_status(inner_iter, samples_per_print):
+                self._print_training_status(inner_iter, nsamples)
+            start = stop
+
+    def _train_batch(self, data, epochs, track_errors, nsamples_error, online_errors, verbose, start_epoch = 0, checkpoint_path = None, checkpoint_every = 1):
+        nsamples = len(data)
+        for epoch in range(start_epoch, epochs):
+            if track_errors:
+                self._track_errors(epoch * nsamples, data, nsamples_error)
+            if verbose:
+                self._print_epoch_summary(epoch+1, epochs)
+
+            sigma = self.decay_sigma_func(self.initial_sigma, epoch, epochs, self.final_sigma)
+            if online_errors:
+                numerator, denominator, units, distances = self._batch_accumulators(data, sigma, k = 2)
+                self._track_errors(epoch * nsamples, data, None, (distances[:, 0], self._topographic_errors(units)))
+                self._set_batch_prototypes(numerator, denominator)
+            else:
+                self._batch_update(data, sigma)
+            self._end_epoch(epoch, epochs, checkpoint_path, checkpoint_every)
+
+        if track_errors:
+            self._track_errors(epochs * nsamples, data, nsamples_error)
+        self._print_finish_message()
+
+    def _batch_update(self, data, sigma):
+        numerator, denominator, _, _ = self._batch_accumulators(data, sigma)
+        self._set_batch_prototypes(numerator, denominator)
+
+    def _batch_accumulators(self, data, sigma, k = 1):
+        # Batch SOM numerator and denominator for `data`, plus the flat indices of the k best matching units 
+        # of every sample and the distances to them, with shape (nsamples, k).
+        # Accumulators of disjoint subsets of the data can be summed before calling `_set_batch_prototypes`
+        data = np.asarray(data, dtype = self.dtype)
+        if k == 1:
+            bmus, distances = self._batch_bmus(data)
+            units, distances = bmus[:, np.newaxis], distances[:, np.newaxis]
+        else:
+            units, distances = self._batch_k_bmus(data, k)
+        bmus = units[:, 0]
+        numerator, denominator = batch_accumulate(data.reshape(len(data), -1), bmus, self.height * self.width,
+                                                  lambda bmu: self._neighborhood_values(divmod(int(bmu), self.width), sigma),
+                                                  self.neighborhood_cutoff)
+        return numerator, denominator, units, distances
+
+    def _set_batch_prototypes(self, numerator, denominator):
+        # Units without any neighborhood mass keep their previous prototype
+        flat_prototypes = self._prototypes.reshape(len(denominator), -1)
+        updated = denominator > 0
+        flat_prototypes[updated] = numerator[updated] / denominator[updated, np.newaxis]
+        self._prototypes = flat_prototypes.reshape(self._prototypes.shape)
+        self._prototypes_version += 1
+
+    def _update(self, sample, learning_rate, sigma, bmu = None):
+
+        if bmu is None:
+            bmu = self.get_BMU(sample)
+        neighborhood_vals = np.asarray(self._neighborhood_values(bmu, sigma), dtype = self.dtype)
+        weights = self.dtype.type(learning_rate) * neighborhood_vals
+
+        # Only the bounding box of the units above the cutoff is updated, in place. 
+        # Units inside the box that are below the cutoff get a zero weight and remain unchanged
+        updated = np.abs(neighborhood_vals) > self.neighborhood_cutoff
+        rows, cols = np.nonzero(updated)
+        if len(rows) == 0:
+            return
+        box = (slice(rows.min(), rows.max() + 1), slice(cols.min(), cols.max() + 1))
+        box_weights = np.where(updated[box], weights[box], 0)[..., np.newaxis, np.newaxis]
+        box_prototypes = self._prototypes[box]
+        box_prototypes += box_weights * (sample - box_prototypes)
+        self._prototypes_version += 1
  
+    def _neighborhood_values(self, center, sigma):
+        neighborhood = jit_codes_map.get(self.neighborhood_function)
+        if neighborhood is None:
+            return self.neighborhood_function(self._grid, center, sigma)
+        return neighborhood_values(distances_window(self._offset_distances, center), sigma, neighborhood)
+
     def get_BMU(self, sample: np.ndarray) -> Tuple:
         """
         Return BMU coordinates for a given `sample`, following matrix notation: `(row, col)`.
@@ -275,7 +814,12 @@ class HSOM:
             Coordinates of the Best Matching Unit `(row, col)`.
         """
 
-        distances = self.distance_function(self._prototypes, sample)
+        sample = np.asarray(sample, dtype = self.dtype)
+        if self._use_pruned_search():
+            unit, _ = dtw_bmu(self._prototypes, *self._get_envelopes(), sample, self._window_size())
+            return tuple(int(x) for x in np.unravel_index(unit, (self.height, self.width)))
+
+        distances = self._distances(sample)
         unraveled = np.unravel_index(distances.argmin(), distances.shape)
         return tuple(int(x) for x in unraveled)
     
@@ -293,72 +837,240 @@ class HSOM:
         float
             distance to the BMU.
         """
-        return float(self.distance_function(self._prototypes, sample).min() )
+        sample = np.asarray(sample, dtype = self.dtype)
+        if self._use_pruned_search():
+            _, distance = dtw_bmu(self._prototypes, *self._get_envelopes(), sample, self._window_size())
+            return float(distance)
+        return float(self._distances(sample).min() )
+
+    def get_BMUs(self, samples: np.ndarray | str, chunk_size: int = 4096, verbose: bool = False) -> np.ndarray:
+        """
+        Return BMU coordinates for every sample in `samples`, following matrix notation: `(row, col)`.
+
+        Distances are computed in batched passes over chunks of samples, which is much faster than 
+        calling `get_BMU` once per sample.
+
+        Parameters
+        ----------
+        samples : np.ndarray or str
+            Array of input samples with shape `(n_samples, seq_len, 2)`, or path to a `.npy` file, which is memory-mapped.
+
+        chunk_size : int, optional (default=4096)
+            Number of samples evaluated at once. Peak memory grows with `chunk_size`, not with the number of samples.
+
+        verbose : bool, optional (default=False)
+            If True, the number of samples processed, the throughput and the peak memory of the process are printed after each chunk.
+
+        Returns
+        -------
+        np.ndarray
+            Integer array of shape `(n_samples, 2)` with the `(row, col)` coordinates of each BMU.
+        """
+        return self.project(samples, chunk_size, verbose).coordinates()
     
-    def classify(self, samples: np.ndarray) -> dict[tuple, list]:
+    def project(self, samples: np.ndarray | str, chunk_size: int = 4096, verbose: bool = False) -> Projection:
+        """
+        Compute the BMU of every sample in `samples` and group the samples by unit.
+
+        Parameters
+        ----------
+        samples : np.ndarray or str
+            Array of input samples with shape `(n_samples, seq_len, 2)`, or path to a `.npy` file, which is memory-mapped.
+
+        chunk_size : int, optional (default=4096)
+            Number of samples evaluated at once. Peak memory grows with `chunk_size`, not with the number of samples.
+
+        verbose : bool, optional (default=False)
+            If True, the number of samples processed, the throughput and the peak memory of the process are printed after each chunk.
+
+        Returns
+        -------
+        Projection
+            Flat BMU index and BMU distance of every sample, plus a CSR-style grouping of sample indices by unit 
+            (see `hysom.projection.Projection`). Its arrays are read-only.
+
+        Notes
+        -----
+        Projections are cached, so `get_BMUs`, `classify`, `quantization_error`, `attribute_matrix`, `frequency_matrix` 
+        and the heat maps in `hysom.utils.plots` share a single BMU search when they are called with the same data.
+        Arrays are identified by object identity and `.npy` files by path and modification time; cached projections are 
+        invalidated when the prototypes change (`train`, `set_init_prototypes`) or when the distance function or window change.
+        At most `projection_cache_size` (default 8) projections are kept, evicting the least recently used. 
+        Set `projection_cache_size = 0` to disable caching, and call `clear_projection_cache()` after modifying 
+        an array in place.
+
+        Examples
+        --------
+        >>> projection = som.project(loops)
+        >>> projection.counts()                    # frequency of each unit, shape (height, width)
+        >>> projection.unit_samples(loops, (0, 1)) # loops matched to unit (0, 1)
+        """
+        state = (self._prototypes_version, self.distance_function, self._window_size())
+        if self._projections_state != state:
+            self.clear_projection_cache()
+            self._projections_state = state
+
+        key, ref = self._projection_key(samples)
+        entry = self._projections.get(key)
+        if entry is not None and (ref is None or entry[0]() is samples):
+            self._projections.move_to_end(key)
+            return entry[1]
+
+        projection = Projection(*self._chunked_bmus(samples, chunk_size, verbose), self.height, self.width)
+        for array in (projection.bmus, projection.distances, projection.order, projection.offsets):
+            array.flags.writeable = False
+        if key is not None and self.projection_cache_size > 0:
+            self._projections[key] = (ref, projection)
+            while len(self._projections) > self.projection_cache_size:
+                self._projections.popitem(last = False)
+        return projection
+
+    def clear_projection_cache(self):
+        """Remove all cached projections (see `project`)."""
+        self._projections.clear()
+
+    def classify(self, samples: np.ndarray | str, chunk_size: int = 4096, verbose: bool = False, output: str = "dict") -> dict[tuple, list] | Projection:
         """
         Assign each sample in `samples` to its Best Matching Unit (BMU).
 
         Parameters
         ----------
-        samples : np.ndarray
-            Array of input samples with shape `(n_samples, seq_len, n_features)`.
+        samples : np.ndarray or str
+            Array of input samples with shape `(n_samples, seq_len, n_features)`, or path to a `.npy` file, which is memory-mapped.
             For this SOM implementation, `n_features` is typically 2.
 
+        chunk_size : int, optional (default=4096)
+            Number of samples evaluated at once. Peak memory grows with `chunk_size`, not with the number of samples.
+
+        verbose : bool, optional (default=False)
+            If True, the number of samples processed, the throughput and the peak memory of the process are printed after each chunk.
+
+        output : str, optional (default="dict")
+            Output format.   
+
+            Available options: `"dict"`, `"indices"`.   
+
+            `"indices"` returns the same `Projection` as `project`: arrays of BMU indices and sample indices grouped 
+            by unit, which are much faster to build and to consume than the dictionary for large datasets.
+
         Returns
         -------
-        dict[tuple, list]
-            A dictionary mapping BMU coordinates (row, col) to a list of samples
+        dict[tuple, list] or Projection
+            With `output="dict"`, a dictionary mapping BMU coordinates (row, col) to a list of samples
             whose BMU corresponds to that coordinate. Each key is a tuple
             representing the BMU position on the SOM grid, and each value is the
-            list of samples assigned to that node.
+            list of samples assigned to that node. Samples are views of `samples`, not copies.  
+            With `output="indices"`, a `Projection`.
         """
+        validate_option(output, ("dict", "indices"), "output")
+        projection = self.project(samples, chunk_size, verbose)
+        samples = load_samples(samples)
+        if output == "indices":
+            return projection
+
+        # Units are listed in order of first appearance, as when samples are appended one by one
+        groups = sorted(projection.groups(), key = lambda group: group[1][0])
         out = defaultdict(list)
-        for sample in samples:
-            bmu = self.get_BMU(sample)
-            out[bmu].append(sample)
+        for bmu, idxs in groups:
+            out[bmu] = [samples[idx] for idx in idxs]
         return out
 
-    def quantization_error(self, data: np.ndarray) -> List:
+    def quantization_error(self, data: np.ndarray | str, chunk_size: int = 4096, verbose: bool = False) -> List:
         """
         Compute the quantization error for each sample in `data`.
 
         Parameters
         ----------
-        data : np.ndarray
-            Collection of data samples with shape `(nsamples, seq_len, 2)`.
+        data : np.ndarray or str
+            Collection of data samples with shape `(nsamples, seq_len, 2)`, or path to a `.npy` file, which is memory-mapped.
+
+        chunk_size : int, optional (default=4096)
+            Number of samples evaluated at once. Peak memory grows with `chunk_size`, not with the number of samples.
+
+        verbose : bool, optional (default=False)
+            If True, the number of samples processed, the throughput and the peak memory of the process are printed after each chunk.
 
         Returns
         -------
         List
             Quantization error for each data sample.
         """
-        return [self.distance_function(self._prototypes, sample).min() for sample in data]
+        return self.project(data, chunk_size, verbose).distances.tolist()
 
-    def topographic_error(self, data: np.ndarray) -> List:
+    def topographic_error(self, data: np.ndarray | str, chunk_size: int = 4096, verbose: bool = False) -> List:
         """
         Compute the topographic error for each sample in `data`.
 
         Parameters
         ----------
-        data : np.ndarray
-            Collection of data samples with shape `(nsamples, seq_len, 2)`.
+        data : np.ndarray or str
+            Collection of data samples with shape `(nsamples, seq_len, 2)`, or path to a `.npy` file, which is memory-mapped.
+
+        chunk_size : int, optional (default=4096)
+            Number of samples evaluated at once. Peak memory grows with `chunk_size`, not with the number of samples.
+
+        verbose : bool, optional (default=False)
+            If True, the number of samples processed, the throughput and the peak memory of the process are printed after each chunk.
 
         Returns
         -------
         List
             Topographic error for each data sample.
         """
-        distances = np.array([self.distance_function(self._prototypes, sample) for sample in data])
-        xyindexes = [np.unravel_index(np.argpartition(dist_matrix.flatten(), (0,1))[[0,1]], (self.height, self.width)) for dist_matrix in distances]
-        bmu_to_nextbmu_dists = [max(abs(X[0] - X[1]), abs(Y[0] - Y[1])) for X,Y in xyindexes]
-        return (np.array(bmu_to_nextbmu_dists) > 1).astype(int).tolist()
+        units, _ = self.get_k_BMUs(data, 2, chunk_size, verbose)
+        return self._topographic_errors(units).tolist()
+
+    def get_k_BMUs(self, samples: np.ndarray | str, k: int = 2, chunk_size: int = 4096, verbose: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the `k` best matching units of every sample in `samples`, sorted by distance.
+
+        All units are found in one batched pass. With `distance_function="dtw"` and `bmu_search="pruned"`, 
+        the lower-bound search of `get_BMU` is used with the k-th best distance as pruning threshold.
+        Ties are resolved in favour of the lowest unit index.
+
+        Parameters
+        ----------
+        samples : np.ndarray or str
+            Array of input samples with shape `(n_samples, seq_len, 2)`, or path to a `.npy` file, which is memory-mapped.
+
+        k : int, optional (default=2)
+            Number of units returned per sample, between 1 and `width * height`.
+
+        chunk_size : int, optional (default=4096)
+            Number of samples evaluated at once. Peak memory grows with `chunk_size`, not with the number of samples.
+
+        verbose : bool, optional (default=False)
+            If True, the number of samples processed, the throughput and the peak memory of the process are printed after each chunk.
+
+        Returns
+        -------
+        units : np.ndarray
+            Integer array of shape `(n_samples, k)` with flat unit indices (`row * width + col`). 
+            Use `np.unravel_index(units, (height, width))` to get `(row, col)` coordinates.
+
+        distances : np.ndarray
+            Array of shape `(n_samples, k)` with the distance of each sample to each of those units.
+
+        Examples
+        --------
+        >>> units, distances = som.get_k_BMUs(loops, k = 2)
+        >>> qe = distances[:, 0]                       # quantization error
+        >>> margin = distances[:, 1] - distances[:, 0] # confidence of the assignment to the BMU
+        """
+        validate_k(k, self.width * self.height)
+        data = load_samples(samples)
+        units = np.empty((len(data), k), dtype = np.int64)
+        distances = np.empty((len(data), k), dtype = self.dtype)
+        for start, chunk in self._iter_chunks(data, chunk_size, verbose):
+            stop = start + len(chunk)
+            units[start:stop], distances[start:stop] = self._batch_k_bmus(chunk, k)
+        return units, distances
 
     def get_QE_history(self) -> Tuple:
         """
         Get the average quantization error across iterations.
 
-        Only available if `track_errors` is set to `True` during training.
+        Only available if `track_errors` is set to `True` or `"online"` during training.
 
         Returns
         -------
@@ -380,7 +1092,7 @@ class HSOM:
         """
         Get the average topographic error across iterations.
 
-        Only available if `track_errors` is set to `True` during training.
+        Only available if `track_errors` is set to `True` or `"online"` during training.
 
         Returns
         -------
@@ -391,7 +1103,7 @@ class HSOM:
             Average topographic error values.
 
         """
-        if self._QE:
+        if self._TE:
             t, te = zip(*self._TE)
         else: 
             t = te = None
@@ -415,16 +1127,18 @@ class HSOM:
 
         return self._prototypes
     
-    def attribute_matrix(self, data: np.ndarray,
+    def attribute_matrix(self, data: np.ndarray | str,
                       attribute: np.ndarray,
-                      agg_method: Callable[[List], float] = np.median) -> np.ndarray:
+                      agg_method: Callable[[List], float] = np.median,
+                      chunk_size: int = 4096,
+                      verbose: bool = False) -> np.ndarray:
         """
         Create an attribute matrix based on the provided data and attribute values.
 
         Parameters
         ----------
-        data : np.ndarray
-            Collection of data samples with shape `(nsamples, seq_len, 2)`.
+        data : np.ndarray or str
+            Collection of data samples with shape `(nsamples, seq_len, 2)`, or path to a `.npy` file, which is memory-mapped.
 
         attribute : np.ndarray
             Attribute values corresponding to each sample in `data`.
@@ -432,60 +1146,173 @@ class HSOM:
         agg_method : Callable, optional (default=np.median)
             Aggregation method to apply to the attribute values for each BMU.
 
+        chunk_size : int, optional (default=4096)
+            Number of samples evaluated at once. Peak memory grows with `chunk_size`, not with the number of samples.
+
+        verbose : bool, optional (default=False)
+            If True, the number of samples processed, the throughput and the peak memory of the process are printed after each chunk.
+
         Returns
         -------
         np.ndarray
             Attribute map with shape `(height, width)`.
         """
-        
-        bmus = [self.get_BMU(sample) for sample in data]
-        bmu_to_attr = {bmu: [] for bmu in set(bmus)}
-        
-        for bmu, attr in zip(bmus, attribute):
-            bmu_to_attr[bmu].append(attr)
+        if not isinstance(attribute, np.ndarray):
+            attribute = list(attribute)
 
         attr_map = np.empty((self.height, self.width))
         attr_map.fill(np.nan)
 
-        for bmu, attrs in bmu_to_attr.items():
-            attr_map[bmu] = agg_method(attrs)
+        for bmu, idxs in self.project(data, chunk_size, verbose).groups():
+            attr_map[bmu] = agg_method([attribute[idx] for idx in idxs])
 
         return attr_map
     
-    def frequency_matrix(self, data: np.ndarray, relative = False) -> np.ndarray:
+    def frequency_matrix(self, data: np.ndarray | str, relative = False, chunk_size: int = 4096, verbose: bool = False) -> np.ndarray:
         """
         Create a frequency matrix based on the provided data.
 
         Parameters
         ----------
-        data : np.ndarray
-            Collection of data samples with shape `(nsamples, seq_len, 2)`.
+        data : np.ndarray or str
+            Collection of data samples with shape `(nsamples, seq_len, 2)`, or path to a `.npy` file, which is memory-mapped.
+
+        chunk_size : int, optional (default=4096)
+            Number of samples evaluated at once. Peak memory grows with `chunk_size`, not with the number of samples.
+
+        verbose : bool, optional (default=False)
+            If True, the number of samples processed, the throughput and the peak memory of the process are printed after each chunk.
 
         Returns
         -------
         np.ndarray
             Frequency matrix with shape `(height, width)`.
         """
-        freq_matrix = self.attribute_matrix(data = data, attribute= np.ones(len(data)), agg_method=sum)
-        freq_matrix[np.isnan(freq_matrix)] = 0  # Replace NaN values with 0
+        freq_matrix = self.project(data, chunk_size, verbose).counts().astype(float)
         if relative:
             freq_matrix = freq_matrix / freq_matrix.sum()  # Normalize to [0, 1]
         return freq_matrix
 
-    def _track_errors(self, iter, data, nsamples_error):
-        subset = self._rng.choice(data, size = nsamples_error, replace=False)
-        qe, te = self._compute_errors_fast(subset)
+    def _track_errors(self, iter, data, nsamples_error, sample_errors = None):
+        # Errors are averaged from `sample_errors` (QE and TE of samples measured during training) when given, 
+        # otherwise computed on a random subset of `data`
+        if sample_errors is not None:
+            qe, te = (float(np.mean(errors)) for errors in sample_errors)
+        else:
+            # Same subset as `rng.choice(data, ...)`, gathered one chunk at a time
+            subset = self._errors_rng.choice(len(data), size = nsamples_error, replace=False)
+            qe, te = self._compute_errors_fast(data, subset)
         self._QE.append((iter, qe))
         self._TE.append((iter, te))
 
-    def _compute_errors_fast(self, data):
-        distances = np.array([self.distance_function(self._prototypes, sample) for sample in data])
-        qe = distances.min(axis = (1,2)).mean() 
-
-        xyindexes = [np.unravel_index(np.argpartition(dist_matrix.flatten(), (0,1))[[0,1]], (self.height, self.width)) for dist_matrix in distances]
-        bmu_to_nextbmu_dists = [max(abs(X[0] - X[1]), abs(Y[0] - Y[1])) for X,Y in xyindexes]
-        te = (np.array(bmu_to_nextbmu_dists) > 1).sum() / len(data)
-        return float(qe), float(te) 
+    def _compute_errors_fast(self, data, idxs = None, chunk_size = 4096):
+        # Average QE and TE of `data[idxs]` (all of `data` if `idxs` is None)
+        nsamples = len(data) if idxs is None else len(idxs)
+        qe_sum = te_sum = 0
+        for start in range(0, nsamples, chunk_size):
+            chunk = data[start:start + chunk_size] if idxs is None else data[idxs[start:start + chunk_size]]
+            units, distances = self._batch_k_bmus(chunk, 2)
+            qe_sum += distances[:, 0].sum()
+            te_sum += self._topographic_errors(units).sum()
+        return float(qe_sum / nsamples), float(te_sum / nsamples)
+
+    def _projection_key(self, samples):
+        # Cache key and weak reference used to check the identity of cached arrays. 
+        # Samples that cannot be referenced weakly (e.g. lists) are not cached
+        if isinstance(samples, (str, os.PathLike)):
+            stat = os.stat(samples)
+            return ("path", os.path.abspath(samples), stat.st_mtime_ns, stat.st_size), None
+        try:
+            return ("array", id(samples)), weakref.ref(samples)
+        except TypeError:
+            return None, None
+
+    def _errors_window(self, sample_errors, inner_iter, samples_per_error):
+        # Errors of the last `samples_per_error` samples of the epoch, or None if they were not measured
+        if sample_errors.shape[1] == 0:
+            return None
+        return sample_errors[:, inner_iter + 1 - samples_per_error: inner_iter + 1]
+
+    def _iter_chunks(self, data, chunk_size, verbose = False):
+        # Yield `(start, chunk)` pairs, converting one chunk at a time to the precision of the map
+        validate_chunk_size(chunk_size)
+        progress = ChunkProgress(len(data)) if verbose else None
+        for start in range(0, len(data), chunk_size):
+            chunk = np.asarray(data[start:start + chunk_size], dtype = self.dtype)
+            yield start, chunk
+            if progress:
+                progress.update(len(chunk))
+
+    def _chunked_bmus(self, data, chunk_size, verbose = False):
+        # Flat BMU indices and distances to the BMU, computed chunk by chunk
+        data = load_samples(data)
+        bmus = np.empty(len(data), dtype = np.int64)
+        distances = np.empty(len(data), dtype = self.dtype)
+        for start, chunk in self._iter_chunks(data, chunk_size, verbose):
+            stop = start + len(chunk)
+            bmus[start:stop], distances[start:stop] = self._batch_bmus(chunk)
+        return bmus, distances
+
+    def _distances(self, sample):
+        if self.distance_function is dtw:
+            return dtw(self._prototypes, sample, self._window_size())
+        if self.distance_function is euclidean:
+            return njit_euclidean(self._prototypes, sample)
+        return self.distance_function(self._prototypes, sample)
+
+    def _batch_distances(self, samples):
+        samples = np.asarray(samples, dtype = self.dtype)
+        if len(samples) == 0:
+            return np.empty((0, self.height, self.width), dtype = self.dtype)
+        if self.distance_function is dtw:
+            return dtw_batch(self._prototypes, samples, self._window_size())
+        if self.distance_function is euclidean:
+            return euclidean_gemm(*self._get_flat_prototypes(), samples).reshape(len(samples), self.height, self.width)
+        return np.array([self.distance_function(self._prototypes, sample) for sample in samples])
+
+    def _batch_bmus(self, samples):
+        # Flat BMU indices and distances to the BMU
+        samples = np.asarray(samples, dtype = self.dtype)
+        if len(samples) > 0 and self._use_pruned_search():
+            return dtw_bmu_batch(self._prototypes, *self._get_envelopes(), samples, self._window_size())
+        distances = self._batch_distances(samples).reshape(len(samples), -1)
+        return distances.argmin(axis = 1), distances.min(axis = 1)
+
+    def _batch_k_bmus(self, samples, k):
+        # Flat indices and distances of the k best matching units, sorted by distance
+        samples = np.asarray(samples, dtype = self.dtype)
+        if len(samples) > 0 and self._use_pruned_search():
+            return dtw_k_bmus_batch(self._prototypes, *self._get_envelopes(), samples, k, self._window_size())
+        distances = self._batch_distances(samples).reshape(len(samples), -1)
+        units = np.argsort(distances, axis = 1, kind = "stable")[:, :k]
+        return units, np.take_along_axis(distances, units, axis = 1)
+
+    def _use_pruned_search(self):
+        return self.distance_function is dtw and self.bmu_search == "pruned"
+
+    def _get_envelopes(self):
+        # LB_Keogh envelopes are cached until prototypes or the window change
+        key = (self._prototypes_version, self._window_size())
+        if self._envelopes_key != key:
+            self._envelopes = dtw_envelopes(self._prototypes, self._window_size())
+            self._envelopes_key = key
+        return self._envelopes
+
+    def _get_flat_prototypes(self):
+        # Flattened prototypes and squared norms for the euclidean engine, cached until prototypes change
+        if self._flat_prototypes_version != self._prototypes_version:
+            self._flat_prototypes = flatten_prototypes(self._prototypes)
+            self._flat_prototypes_version = self._prototypes_version
+        return self._flat_prototypes
+
+    def _window_size(self):
+        return resolve_window(self.window, self.input_dim[0])
+
+    def _topographic_errors(self, units):
+        # `units` holds the flat indices of the first and second BMUs
+        rows, cols = np.unravel_index(units[:, :2], (self.height, self.width))
+        bmu_to_nextbmu_dists = np.maximum(np.abs(rows[:, 0] - rows[:, 1]), np.abs(cols[:, 0] - cols[:, 1]))
+        return (bmu_to_nextbmu_dists > 1).astype(int)
 
     def _is_time_to_track_errors(self, inner_iter, samples_per_error):
         return (inner_iter+1) % samples_per_error == 0     
@@ -520,4 +1347,46 @@ class HSOM:
         else:
             te = "--"
         
-        return qe, te
\ No newline at end of file
+        return qe, te
+
+def warmup(dtypes: Iterable[type] = (np.float64,), verbose: bool = False) -> float:
+    """
+    Compile the numba kernels used by `HSOM` for training and evaluation.
+
+    Kernels are compiled with `cache=True`, so they are only compiled by the first process that uses them
+    and loaded from numba's on-disk cache afterwards. Calling `warmup` once at start-up (e.g. in the
+    initializer of a worker pool) moves this cost out of the first `train`, `get_BMU` or `classify` call.
+    A tiny map is trained and evaluated for every built-in distance function and training algorithm.
+
+    Parameters
+    ----------
+    dtypes : iterable of type, optional (default=(np.float64,))
+        Data types of the prototypes and samples to compile for (`np.float32` and/or `np.float64`).
+
+    verbose : bool, optional (default=False)
+        If True, the time spent is printed.
+
+    Returns
+    -------
+    float
+        Elapsed time in seconds.
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(0)
+    for dtype in dtypes:
+        data = rng.random((8, 10, 2)).astype(dtype)
+        for distance_function in distance_functions_map:
+            for algorithm in ("online", "batch"):
+                som = HSOM(width = 2, height = 2, input_dim = data.shape[1:], random_seed = 0, dtype = dtype)
+                with contextlib.redirect_stdout(io.StringIO()): # training always prints a summary
+                    som.train(data, epochs = 1, algorithm = algorithm, distance_function = distance_function, 
+                              track_errors = "online" if algorithm == "online" else True)
+            som.get_BMU(data[0])
+            som.get_distance_to_bmu(data[0])
+            som.classify(data)
+            som.quantization_error(data)
+            som.topographic_error(data)
+    elapsed = time.perf_counter() - start
+    if verbose:
+        print(f"HySOM warmup completed in {elapsed:.2f} s")
+    return elapsed
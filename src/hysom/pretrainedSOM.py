@@ -1,21 +1,44 @@
-from hysom.train_functions import dtw 
+from hysom.train_functions import dtw
 from importlib import resources
+from functools import lru_cache
 from hysom import HSOM
 import numpy as np
-import json 
 
-def get_generalTQSOM() -> HSOM:
+def get_generalTQSOM(shared: bool = False) -> HSOM:
     """
     Returns the General T-Q SOM. A pretrained SOM for sediment transport hysteresis loops.
+
+    The prototypes are read from a binary (`.npy`) file the first time they are needed and kept in memory
+    for the rest of the process, so later calls are almost free.
+
+    Parameters
+    ----------
+    shared : bool, optional (default=False)
+        If False, a new `HSOM` with its own copy of the prototypes is returned, which can be modified or trained further.
+        If True, the same read-only instance is returned on every call within the process. It is meant for inference
+        (e.g. `get_BMUs`, `classify`) in worker processes: its prototypes are memory-mapped and caches such as the
+        DTW envelopes are shared between calls.
     """
-    # prototypes = fetch_json(generalTQsom_prototypes_url)
-    ref = resources.files("hysom.data")
-    prototypes_data_file = ref.joinpath("generalTQSOM_prots.json")
-    with prototypes_data_file.open('r', encoding='utf-8') as f:
-        prototypes = json.load(f)
+    if shared:
+        return _shared_generalTQSOM()
+    return _make_generalTQSOM(np.array(_generalTQSOM_prototypes()))
+
+@lru_cache(maxsize = None)
+def _generalTQSOM_prototypes() -> np.ndarray:
+    ref = resources.files("hysom.data").joinpath("generalTQSOM_prots.npy")
+    with resources.as_file(ref) as path:
+        if ref.is_file() and str(path) == str(ref): # Installed as regular files: map the package data directly
+            return np.load(path, mmap_mode = "r")
+        prototypes = np.load(path) # e.g. zipped package: the temporary file is removed on exit
+        prototypes.flags.writeable = False
+        return prototypes
+
+@lru_cache(maxsize = None)
+def _shared_generalTQSOM() -> HSOM:
+    return _make_generalTQSOM(_generalTQSOM_prototypes())
 
+def _make_generalTQSOM(prototypes):
     som = HSOM(width = 8, height = 8, input_dim=(100,2))
-    som.set_init_prototypes(np.array(prototypes))
+    som.set_init_prototypes(prototypes)
     som.distance_function = dtw
-    
     return som
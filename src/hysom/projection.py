@@ -0,0 +1,92 @@
+import numpy as np
+from typing import Iterator, Tuple
+
+class Projection:
+    """
+    Best Matching Units of a set of samples, grouped by unit.
+
+    Samples are grouped in a compressed sparse row (CSR) layout: `order` holds the sample indices sorted
+    by BMU (samples of the same unit keep their original order) and the indices of the samples matched
+    to flat unit `u` are `order[offsets[u]:offsets[u+1]]`. Units are numbered in row-major order,
+    `u = row * width + col`.
+
+    Parameters
+    ----------
+    bmus : np.ndarray
+        Flat BMU index of every sample.
+
+    distances : np.ndarray
+        Distance of every sample to its BMU.
+
+    height, width : int
+        Map dimensions.
+
+    Attributes
+    ----------
+    bmus : np.ndarray
+        Flat BMU index of every sample, with shape `(nsamples,)`.
+
+    distances : np.ndarray
+        Distance of every sample to its BMU, with shape `(nsamples,)`.
+
+    offsets : np.ndarray
+        Start of the samples of each unit in `order`, with shape `(height * width + 1,)`.
+
+    order : np.ndarray
+        Sample indices sorted by BMU, with shape `(nsamples,)`.
+    """
+    def __init__(self, bmus: np.ndarray, distances: np.ndarray, height: int, width: int):
+        self.bmus = np.asarray(bmus, dtype = np.int64)
+        self.distances = np.asarray(distances)
+        self.shape = (height, width)
+        self.order = np.argsort(self.bmus, kind = "stable")
+        self.offsets = np.zeros(height * width + 1, dtype = np.int64)
+        np.cumsum(np.bincount(self.bmus, minlength = height * width), out = self.offsets[1:])
+
+    def __len__(self):
+        return len(self.bmus)
+
+    def coordinates(self) -> np.ndarray:
+        """BMU coordinates `(row, col)` of every sample, with shape `(nsamples, 2)`."""
+        return np.stack(np.unravel_index(self.bmus, self.shape), axis = 1)
+
+    def counts(self) -> np.ndarray:
+        """Number of samples matched to each unit, with shape `(height, width)`."""
+        return np.diff(self.offsets).reshape(self.shape)
+
+    def unit_indices(self, bmu: tuple[int, int] | int) -> np.ndarray:
+        """
+        Indices of the samples whose BMU is `bmu`.
+
+        Parameters
+        ----------
+        bmu : tuple or int
+            Unit coordinates `(row, col)` or flat unit index.
+        """
+        unit = self._flat_unit(bmu)
+        return self.order[self.offsets[unit]:self.offsets[unit + 1]]
+
+    def unit_samples(self, samples: np.ndarray, bmu: tuple[int, int] | int) -> np.ndarray:
+        """
+        Samples whose BMU is `bmu`, gathered from the array that was projected.
+
+        Parameters
+        ----------
+        samples : np.ndarray
+            Projected samples (or any array aligned with them, such as attribute values).
+
+        bmu : tuple or int
+            Unit coordinates `(row, col)` or flat unit index.
+        """
+        return samples[self.unit_indices(bmu)]
+
+    def groups(self) -> Iterator[Tuple[tuple, np.ndarray]]:
+        """Yield `(bmu, sample_indices)` for every unit matched by at least one sample, in row-major order."""
+        for unit in np.flatnonzero(np.diff(self.offsets)):
+            bmu = tuple(int(x) for x in np.unravel_index(unit, self.shape))
+            yield bmu, self.order[self.offsets[unit]:self.offsets[unit + 1]]
+
+    def _flat_unit(self, bmu):
+        if isinstance(bmu, tuple):
+            return int(np.ravel_multi_index(bmu, self.shape))
+        return int(bmu)
@@ -0,0 +1,92 @@
+import numpy as np
+from hysom.train_functions import decay_linear, decay_power
+
+# Decay functions that accept arrays of iterations
+vectorized_decay_functions = (decay_power, decay_linear)
+
+class TrainingSchedule:
+    """
+    Sample order, learning rates and neighborhood radii of an online training run.
+
+    Values are generated one epoch at a time, so memory use does not grow with the number of epochs.
+    Built-in decay functions are evaluated on whole epochs at once; custom decay functions are called
+    once per iteration.
+
+    Parameters
+    ----------
+    nsamples : int
+        Number of samples fed to the map each epoch.
+
+    epochs : int
+        Number of epochs. The schedule spans `nsamples * epochs` iterations.
+
+    random_order : bool
+        If True, samples are shuffled every epoch using `rng`.
+
+    rng : np.random.Generator
+        Random number generator used to shuffle the samples.
+
+    initial_learning_rate, final_learning_rate : float
+        Learning rate at the first and last iterations.
+
+    decay_learning_rate_func : callable
+        Decay function for the learning rate (see `HSOM.train`).
+
+    initial_sigma, final_sigma : float
+        Neighborhood radius at the first and last iterations.
+
+    decay_sigma_func : callable
+        Decay function for the neighborhood radius (see `HSOM.train`).
+    """
+    def __init__(self, nsamples, epochs, random_order, rng,
+                 initial_learning_rate, final_learning_rate, decay_learning_rate_func,
+                 initial_sigma, final_sigma, decay_sigma_func):
+        self.nsamples = nsamples
+        self.epochs = epochs
+        self.random_order = random_order
+        self.max_iter = nsamples * epochs
+        self._rng = rng
+        self._learning_rate = (initial_learning_rate, final_learning_rate, decay_learning_rate_func)
+        self._sigma = (initial_sigma, final_sigma, decay_sigma_func)
+
+    def __iter__(self):
+        """Yield `(epoch, indices, learning_rates, sigmas)` for every epoch."""
+        return self.epochs_from(0)
+
+    def epochs_from(self, start_epoch: int):
+        """Yield `(epoch, indices, learning_rates, sigmas)` for every epoch from `start_epoch` on (used to resume a run)."""
+        for epoch in range(start_epoch, self.epochs):
+            yield (epoch, self.epoch_indices(), *self.epoch_values(epoch))
+
+    def epoch_indices(self) -> np.ndarray:
+        """
+        Sample indices for the next epoch, as an `int32` array.
+
+        Shuffled indices are drawn from `rng` when this method is called, so epochs must be requested in order.
+        """
+        idxs = np.arange(self.nsamples, dtype = np.int32)
+        if self.random_order:
+            self._rng.shuffle(idxs)
+        return idxs
+
+    def epoch_values(self, epoch: int):
+        """
+        Learning rates and neighborhood radii for every iteration of `epoch`.
+
+        Returns
+        -------
+        learning_rates : np.ndarray
+        sigmas : np.ndarray
+        """
+        iterations = np.arange(epoch * self.nsamples, (epoch + 1) * self.nsamples)
+        return self.values(iterations, *self._learning_rate), self.values(iterations, *self._sigma)
+
+    def values(self, iterations, init_val, final_val, decay_func) -> np.ndarray:
+        """Evaluate `decay_func` at every iteration in `iterations`."""
+        return decay_values(iterations, init_val, final_val, decay_func, self.max_iter)
+
+def decay_values(iterations, init_val, final_val, decay_func, max_iter) -> np.ndarray:
+    """Evaluate `decay_func` at every iteration in `iterations`, for a run of `max_iter` iterations."""
+    if decay_func in vectorized_decay_functions:
+        return np.asarray(decay_func(init_val, iterations, max_iter, final_val), dtype = np.float64)
+    return np.array([decay_func(init_val, int(iter), max_iter, final_val) for iter in iterations], dtype = np.float64)
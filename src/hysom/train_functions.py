@@ -3,25 +3,112 @@ import warnings
 import numba as nb
 from numba import prange
 
+# Codes identifying the built-in functions inside compiled training kernels
+NEIGHBORHOOD_GAUSSIAN, NEIGHBORHOOD_BUBBLE, NEIGHBORHOOD_CUTOFF_GAUSSIAN, NEIGHBORHOOD_MEXICAN_HAT = 0, 1, 2, 3
+DISTANCE_DTW, DISTANCE_EUCLIDEAN = 0, 1
+
 #Decay functions
+@nb.njit(cache = True)
 def decay_linear(init_val, iter, max_iter, final_val):
      slope =  (init_val - final_val) / max_iter 
      return init_val - (slope * iter)
 
+@nb.njit(cache = True)
 def decay_power(init_val, iter, max_iter, final_val):
      min_frac = final_val / init_val
      fraction = min_frac ** (iter / max_iter)
      return init_val * fraction
 
 # Neighborhood functions
+@nb.njit(cache = True)
 def gaussian(grid, center, sigma):
-    
-    distances = np.sqrt( (grid[0] - center[0])**2 + (grid[1] - center[1])**2 )
-    neig_vals = np.exp( - distances ** 2 / (2 * sigma**2))
-    return neig_vals
+    return _gaussian(_grid_distances_to(grid, center), sigma)
 
+@nb.njit(cache = True)
 def bubble(grid, center, sigma):
-     pass
+    return _bubble(_grid_distances_to(grid, center), sigma)
+
+@nb.njit(cache = True)
+def cutoff_gaussian(grid, center, sigma):
+    return _cutoff_gaussian(_grid_distances_to(grid, center), sigma)
+
+@nb.njit(cache = True)
+def mexican_hat(grid, center, sigma):
+    return _mexican_hat(_grid_distances_to(grid, center), sigma)
+
+@nb.njit(cache = True)
+def _grid_distances_to(grid, center):
+    return np.sqrt( (grid[0] - center[0])**2 + (grid[1] - center[1])**2 )
+
+@nb.njit(cache = True)
+def _gaussian(distances, sigma):
+    return np.exp( - distances ** 2 / (2 * sigma**2))
+
+@nb.njit(cache = True)
+def _bubble(distances, sigma):
+    return (distances <= sigma).astype(np.float64)
+
+@nb.njit(cache = True)
+def _cutoff_gaussian(distances, sigma):
+    return _gaussian(distances, sigma) * (distances <= sigma)
+
+@nb.njit(cache = True)
+def _mexican_hat(distances, sigma):
+    return (1 - distances ** 2 / sigma**2) * np.exp( - distances ** 2 / (2 * sigma**2))
+
+@nb.njit(cache = True)
+def neighborhood_values(distances, sigma, neighborhood):
+    # Built-in neighborhood function `neighborhood` (one of the NEIGHBORHOOD_* codes) evaluated on grid distances
+    if neighborhood == NEIGHBORHOOD_BUBBLE:
+        return _bubble(distances, sigma)
+    if neighborhood == NEIGHBORHOOD_CUTOFF_GAUSSIAN:
+        return _cutoff_gaussian(distances, sigma)
+    if neighborhood == NEIGHBORHOOD_MEXICAN_HAT:
+        return _mexican_hat(distances, sigma)
+    return _gaussian(distances, sigma)
+
+def offset_grid_distances(height, width):
+    # Grid distance for every (row, col) offset between two units, shape (2 * height - 1, 2 * width - 1). 
+    # The distances from unit (i, j) to every unit are the (height, width) window returned by `distances_window`
+    # Plain numpy (same result as `_grid_distances_to`): building an HSOM does not need to start numba
+    rows, cols = np.meshgrid(np.arange(2 * height - 1), np.arange(2 * width - 1), indexing="ij")
+    return np.sqrt((rows - (height - 1))**2 + (cols - (width - 1))**2)
+
+@nb.njit(cache = True)
+def distances_window(offset_distances, center):
+    height = (offset_distances.shape[0] + 1) // 2
+    width = (offset_distances.shape[1] + 1) // 2
+    i, j = center
+    return offset_distances[height - 1 - i: 2 * height - 1 - i, width - 1 - j: 2 * width - 1 - j]
+
+# Batch training
+
+@nb.njit(cache = True)
+def _sum_by_bmu(flat_samples, bmus, nunits):
+    sums = np.zeros((nunits, flat_samples.shape[1]), dtype = flat_samples.dtype)
+    counts = np.zeros(nunits, dtype = flat_samples.dtype)
+    for n in range(flat_samples.shape[0]):
+        counts[bmus[n]] += 1
+        for d in range(flat_samples.shape[1]):
+            sums[bmus[n], d] += flat_samples[n, d]
+    return sums, counts
+
+def batch_accumulate(flat_samples, bmus, nunits, neighborhood_row, neighborhood_cutoff, block_size = 256):
+    # Numerator (sum of neighborhood-weighted samples) and denominator (sum of weights) of the batch SOM 
+    # update for every unit. Samples are first summed per BMU; `neighborhood_row(c)` returns the weights of
+    # every unit when `c` is the BMU and is only called for units that are the BMU of some sample. 
+    # The rows are applied `block_size` BMUs at a time, so no (nunits, nunits) table is built
+    sums, counts = _sum_by_bmu(flat_samples, bmus, nunits)
+    numerator = np.zeros_like(sums)
+    denominator = np.zeros_like(counts)
+    matched = np.flatnonzero(counts)
+    for start in range(0, len(matched), block_size):
+        block = matched[start: start + block_size]
+        weights = np.array([np.ravel(neighborhood_row(bmu)) for bmu in block], dtype = sums.dtype)
+        weights[np.abs(weights) <= neighborhood_cutoff] = 0
+        numerator += weights.T @ sums[block]
+        denominator += weights.T @ counts[block]
+    return numerator, denominator
 
 # Distance Functions
 
@@ -29,32 +116,339 @@ def euclidean(prototypes, sample):
     dif_sqr = (prototypes - sample)**2
     return dif_sqr.sum(axis = (-1,-2))
 
-@nb.njit
+def flatten_prototypes(prototypes):
+    # (height * width, seq_len * n_features) view of the prototypes and their squared norms
+    flat_prototypes = prototypes.reshape(prototypes.shape[0] * prototypes.shape[1], -1)
+    return flat_prototypes, np.einsum("ij,ij->i", flat_prototypes, flat_prototypes)
+
+@nb.njit(cache = True)
+def njit_euclidean(prototypes, sample):
+    rows, columns = prototypes.shape[:2]
+    distances = np.empty((rows, columns), dtype = prototypes.dtype)
+    for i in range(rows):
+        for j in range(columns):
+            acum = prototypes.dtype.type(0)
+            for t in range(sample.shape[0]):
+                acum += _njit_local_sqr_dist(prototypes[i, j, t], sample[t])
+            distances[i, j] = acum
+    return distances
+
+def euclidean_gemm(flat_prototypes, prototypes_sqr_norms, samples):
+    # Squared euclidean distances from every sample to every prototype, shape (n_samples, height * width),
+    # using ||a - b||^2 = ||a||^2 - 2ab + ||b||^2 so the bulk of the work is a single matrix product
+    flat_samples = samples.reshape(len(samples), -1)
+    samples_sqr_norms = np.einsum("ij,ij->i", flat_samples, flat_samples)
+    distances = flat_samples @ flat_prototypes.T
+    distances *= -2
+    distances += samples_sqr_norms[:, None]
+    distances += prototypes_sqr_norms
+    return np.maximum(distances, 0, out = distances)
+
+@nb.njit(cache = True)
 def njit_dtw(x, x_prime):
-    R = np.zeros(shape = (len(x), len(x_prime)))
+    R = np.zeros(shape = (len(x), len(x_prime)), dtype = x.dtype)
+    inf = x.dtype.type(np.inf)
     for i in range(len(x)):
         for j in range(len(x_prime)):
             R[i, j] = _njit_local_sqr_dist(x[i], x_prime[j])
             if i > 0 or j > 0:
                 R[i, j] += min(
-                R[i-1, j  ] if i > 0             else np.inf,
-                R[i  , j-1] if j > 0             else np.inf,
-                R[i-1, j-1] if (i > 0 and j > 0) else np.inf
+                R[i-1, j  ] if i > 0             else inf,
+                R[i  , j-1] if j > 0             else inf,
+                R[i-1, j-1] if (i > 0 and j > 0) else inf
                 )
     return (R[-1, -1])**(1/2)
 
-@nb.njit
+@nb.njit(cache = True)
+def njit_dtw_window(x, x_prime, window):
+    # Sakoe-Chiba band: only cells with |i - j| <= window are evaluated. 
+    # Rows are stored in band coordinates (k = j - i + window) so buffers have 2 * window + 1 cells
+    n, m = len(x), len(x_prime)
+    window = max(window, abs(n - m))
+    band = 2 * window + 1
+    inf = x.dtype.type(np.inf)
+    prev = np.full(band, inf)
+    curr = np.full(band, inf)
+    for i in range(n):
+        curr[:] = inf
+        for j in range(max(0, i - window), min(m, i + window + 1)):
+            k = j - i + window
+            curr[k] = _njit_local_sqr_dist(x[i], x_prime[j])
+            if i > 0 or j > 0:
+                curr[k] += min(
+                prev[k+1] if k + 1 < band else inf,
+                curr[k-1] if k > 0        else inf,
+                prev[k]
+                )
+        prev, curr = curr, prev
+    return (prev[m - n + window])**(1/2)
+
+@nb.njit(cache = True)
 def _njit_local_sqr_dist(x1, x2):
-    acum = 0.0
+    acum = x1.dtype.type(0)
     for i in range(x1.shape[0]):
         acum += (x1[i] - x2[i])**2
     return acum
 
-@nb.njit(parallel = True )
-def dtw(prototypes, sample):
-    distances = np.empty(prototypes.shape[:2])
+@nb.njit(parallel = True, cache = True)
+def dtw(prototypes, sample, window = -1):
+    distances = np.empty(prototypes.shape[:2], dtype = prototypes.dtype)
     rows, columns = prototypes.shape[:2]
     for i in prange(rows):
         for j in prange(columns):
-            distances[i,j] = njit_dtw(prototypes[i,j], sample)
+            if window < 0:
+                distances[i,j] = njit_dtw(prototypes[i,j], sample)
+            else:
+                distances[i,j] = njit_dtw_window(prototypes[i,j], sample, window)
     return distances
+
+@nb.njit(parallel = True, cache = True)
+def dtw_batch(prototypes, samples, window = -1):
+    rows, columns = prototypes.shape[:2]
+    nunits = rows * columns
+    distances = np.empty((samples.shape[0], rows, columns), dtype = prototypes.dtype)
+    for k in prange(samples.shape[0] * nunits):
+        n = k // nunits
+        i = (k % nunits) // columns
+        j = k % columns
+        if window < 0:
+            distances[n, i, j] = njit_dtw(prototypes[i, j], samples[n])
+        else:
+            distances[n, i, j] = njit_dtw_window(prototypes[i, j], samples[n], window)
+    return distances
+
+# Pruned BMU search (lower bounds + early abandoning DTW)
+
+@nb.njit(cache = True)
+def njit_dtw_early_abandon(x, x_prime, window, best_so_far):
+    # Same recursion as `njit_dtw_window` but on squared costs. Returns np.inf as soon as 
+    # a whole row of the band exceeds `best_so_far` (squared), since the path cost can only grow
+    n, m = len(x), len(x_prime)
+    if window < 0:
+        window = max(n, m)
+    window = max(window, abs(n - m))
+    band = 2 * window + 1
+    inf = x.dtype.type(np.inf)
+    prev = np.full(band, inf)
+    curr = np.full(band, inf)
+    for i in range(n):
+        curr[:] = inf
+        row_min = inf
+        for j in range(max(0, i - window), min(m, i + window + 1)):
+            k = j - i + window
+            curr[k] = _njit_local_sqr_dist(x[i], x_prime[j])
+            if i > 0 or j > 0:
+                curr[k] += min(
+                prev[k+1] if k + 1 < band else inf,
+                curr[k-1] if k > 0        else inf,
+                prev[k]
+                )
+            row_min = min(row_min, curr[k])
+        if row_min > best_so_far:
+            return np.inf
+        prev, curr = curr, prev
+    return prev[m - n + window]
+
+@nb.njit(cache = True)
+def _running_extrema(x, window, upper, lower):
+    # Van Herk / Gil-Werman running max/min over [i - window, i + window] in O(len(x))
+    n = len(x)
+    if window < 0 or window >= n:
+        upper[:] = x.max()
+        lower[:] = x.min()
+        return
+    span = 2 * window + 1
+    npad = n + 2 * window
+    padded = np.empty(npad, dtype = x.dtype)
+    padded[:window] = np.nan
+    padded[window:window + n] = x
+    padded[window + n:] = np.nan
+    g_max = np.empty(npad, dtype = x.dtype)
+    g_min = np.empty(npad, dtype = x.dtype)
+    h_max = np.empty(npad, dtype = x.dtype)
+    h_min = np.empty(npad, dtype = x.dtype)
+    for i in range(npad):
+        v = padded[i]
+        if i % span == 0 or np.isnan(g_max[i-1]):
+            g_max[i] = v
+            g_min[i] = v
+        elif np.isnan(v):
+            g_max[i] = g_max[i-1]
+            g_min[i] = g_min[i-1]
+        else:
+            g_max[i] = max(g_max[i-1], v)
+            g_min[i] = min(g_min[i-1], v)
+    for i in range(npad - 1, -1, -1):
+        v = padded[i]
+        if i == npad - 1 or (i + 1) % span == 0 or np.isnan(h_max[i+1]):
+            h_max[i] = v
+            h_min[i] = v
+        elif np.isnan(v):
+            h_max[i] = h_max[i+1]
+            h_min[i] = h_min[i+1]
+        else:
+            h_max[i] = max(h_max[i+1], v)
+            h_min[i] = min(h_min[i+1], v)
+    for i in range(n):
+        a = h_max[i]
+        b = g_max[i + span - 1]
+        upper[i] = b if np.isnan(a) else (a if np.isnan(b) else max(a, b))
+        a = h_min[i]
+        b = g_min[i + span - 1]
+        lower[i] = b if np.isnan(a) else (a if np.isnan(b) else min(a, b))
+
+@nb.njit(parallel = True, cache = True)
+def dtw_envelopes(prototypes, window = -1):
+    # LB_Keogh envelopes of every prototype and feature, shape (height * width, seq_len, n_features)
+    rows, columns, seq_len, nfeatures = prototypes.shape
+    upper = np.empty((rows * columns, seq_len, nfeatures), dtype = prototypes.dtype)
+    lower = np.empty((rows * columns, seq_len, nfeatures), dtype = prototypes.dtype)
+    for u in prange(rows * columns):
+        i = u // columns
+        j = u % columns
+        for f in range(nfeatures):
+            _running_extrema(np.ascontiguousarray(prototypes[i, j, :, f]), window, upper[u, :, f], lower[u, :, f])
+    return upper, lower
+
+@nb.njit(cache = True)
+def lb_kim(x, x_prime):
+    # First and last points are always aligned
+    bound = _njit_local_sqr_dist(x[0], x_prime[0])
+    if len(x) > 1 and len(x_prime) > 1:
+        bound += _njit_local_sqr_dist(x[-1], x_prime[-1])
+    return bound
+
+@nb.njit(cache = True)
+def lb_keogh(sample, upper, lower):
+    bound = sample.dtype.type(0)
+    for i in range(sample.shape[0]):
+        for f in range(sample.shape[1]):
+            if sample[i, f] > upper[i, f]:
+                bound += (sample[i, f] - upper[i, f])**2
+            elif sample[i, f] < lower[i, f]:
+                bound += (sample[i, f] - lower[i, f])**2
+    return bound
+
+@nb.njit(cache = True)
+def dtw_bmu(prototypes, upper, lower, sample, window = -1):
+    # Exact BMU search. Prototypes are visited by increasing lower bound and the search stops 
+    # once the bound exceeds the best distance found so far. Ties resolve to the lowest unit index
+    rows, columns = prototypes.shape[:2]
+    nunits = rows * columns
+    bounds = np.empty(nunits, dtype = prototypes.dtype)
+    for u in range(nunits):
+        prototype = prototypes[u // columns, u % columns]
+        bounds[u] = max(lb_kim(prototype, sample), lb_keogh(sample, upper[u], lower[u]))
+    best = np.inf
+    best_unit = -1
+    for u in np.argsort(bounds):
+        if bounds[u] > best:
+            break
+        dist = njit_dtw_early_abandon(prototypes[u // columns, u % columns], sample, window, best)
+        if dist < best or (dist == best and u < best_unit):
+            best = dist
+            best_unit = u
+    return best_unit, best**(1/2)
+
+@nb.njit(parallel = True, cache = True)
+def dtw_bmu_batch(prototypes, upper, lower, samples, window = -1):
+    bmus = np.empty(samples.shape[0], dtype = np.int64)
+    distances = np.empty(samples.shape[0], dtype = prototypes.dtype)
+    for n in prange(samples.shape[0]):
+        bmus[n], distances[n] = dtw_bmu(prototypes, upper, lower, samples[n], window)
+    return bmus, distances
+
+@nb.njit(cache = True)
+def dtw_k_bmus(prototypes, upper, lower, sample, k, window = -1):
+    # Exact k best matching units, sorted by distance (ties by unit index). Same search as `dtw_bmu`,
+    # with the k-th best distance found so far as pruning threshold
+    rows, columns = prototypes.shape[:2]
+    nunits = rows * columns
+    bounds = np.empty(nunits, dtype = prototypes.dtype)
+    for u in range(nunits):
+        prototype = prototypes[u // columns, u % columns]
+        bounds[u] = max(lb_kim(prototype, sample), lb_keogh(sample, upper[u], lower[u]))
+    units = np.full(k, -1, dtype = np.int64)
+    costs = np.full(k, np.inf, dtype = prototypes.dtype)
+    for u in np.argsort(bounds):
+        if bounds[u] > costs[k-1]:
+            break
+        cost = njit_dtw_early_abandon(prototypes[u // columns, u % columns], sample, window, costs[k-1])
+        if cost > costs[k-1] or (cost == costs[k-1] and units[k-1] != -1 and u > units[k-1]):
+            continue
+        p = k - 1
+        while p > 0 and (cost < costs[p-1] or (cost == costs[p-1] and u < units[p-1])):
+            costs[p] = costs[p-1]
+            units[p] = units[p-1]
+            p -= 1
+        costs[p] = cost
+        units[p] = u
+    return units, np.sqrt(costs)
+
+@nb.njit(parallel = True, cache = True)
+def dtw_k_bmus_batch(prototypes, upper, lower, samples, k, window = -1):
+    units = np.empty((samples.shape[0], k), dtype = np.int64)
+    distances = np.empty((samples.shape[0], k), dtype = prototypes.dtype)
+    for n in prange(samples.shape[0]):
+        units[n], distances[n] = dtw_k_bmus(prototypes, upper, lower, samples[n], k, window)
+    return units, distances
+
+# Compiled online training
+
+@nb.njit(cache = True)
+def _find_bmu(prototypes, sample, distance, window, pruned):
+    if distance == DISTANCE_DTW and pruned:
+        upper, lower = dtw_envelopes(prototypes, window)
+        unit, _ = dtw_bmu(prototypes, upper, lower, sample, window)
+        return unit
+    if distance == DISTANCE_DTW:
+        return np.argmin(dtw(prototypes, sample, window))
+    return np.argmin(njit_euclidean(prototypes, sample))
+
+@nb.njit(cache = True)
+def _find_two_bmus(prototypes, sample, distance, window, pruned):
+    # First and second BMUs (ties resolve to the lowest unit index) and the distance to the first one
+    if distance == DISTANCE_DTW and pruned:
+        upper, lower = dtw_envelopes(prototypes, window)
+        units, dists = dtw_k_bmus(prototypes, upper, lower, sample, 2, window)
+        return units[0], units[1], dists[0]
+    if distance == DISTANCE_DTW:
+        flat_distances = dtw(prototypes, sample, window).ravel()
+    else:
+        flat_distances = njit_euclidean(prototypes, sample).ravel()
+    first = np.argmin(flat_distances)
+    second = -1
+    for u in range(len(flat_distances)):
+        if u != first and (second == -1 or flat_distances[u] < flat_distances[second]):
+            second = u
+    return first, second, flat_distances[first]
+
+@nb.njit(cache = True)
+def online_train(prototypes, data, idxs, learning_rates, sigmas, offset_distances,
+                 neighborhood, neighborhood_cutoff, distance, window, pruned, qe, te):
+    # Same steps as HSOM._update for a sequence of samples, updating `prototypes` in place. 
+    # Only built-in functions are supported; they are selected by the codes defined above.
+    # If `qe` and `te` are not empty, the quantization and topographic errors of every sample, 
+    # measured during its BMU search, are written to them
+    rows, columns = prototypes.shape[:2]
+    track = len(qe) > 0
+    for n in range(len(idxs)):
+        sample = data[idxs[n]]
+        learning_rate = prototypes.dtype.type(learning_rates[n])
+        sigma = sigmas[n]
+        if track:
+            unit, second, qe[n] = _find_two_bmus(prototypes, sample, distance, window, pruned)
+            te[n] = max(abs(unit // columns - second // columns), abs(unit % columns - second % columns)) > 1
+        else:
+            unit = _find_bmu(prototypes, sample, distance, window, pruned)
+        center = (unit // columns, unit % columns)
+        distances = distances_window(offset_distances, center)
+        neighborhood_vals = neighborhood_values(distances, sigma, neighborhood).astype(prototypes.dtype)
+        for i in range(rows):
+            for j in range(columns):
+                if abs(neighborhood_vals[i, j]) <= neighborhood_cutoff:
+                    continue
+                weight = learning_rate * neighborhood_vals[i, j]
+                for t in range(prototypes.shape[2]):
+                    for f in range(prototypes.shape[3]):
+                        prototypes[i, j, t, f] += weight * (sample[t, f] - prototypes[i, j, t, f])
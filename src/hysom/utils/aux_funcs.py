@@ -1,3 +1,17 @@
+import os
+import sys
+import time
+import struct
+import zipfile
+import tempfile
+import numpy as np
+from numbers import Integral
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
 
 def split_range(start, end, num_parts):
     if num_parts <= 0:
@@ -47,3 +61,79 @@ def resolve_function(func_or_str, func_map):
         return func_or_str
     else:
         raise TypeError("Expected a function or string key.")
+
+def function_name(func, func_map):
+    # Name of a built-in function in `func_map`, or None
+    for name, candidate in func_map.items():
+        if candidate is func:
+            return name
+    return None
+
+def resolve_window(window, seq_len):
+    # Number of cells in the Sakoe-Chiba band. -1 means no constraint
+    if window is None:
+        return -1
+    if not isinstance(window, Integral):
+        return int(np.ceil(window * seq_len))
+    return int(window)
+
+def load_samples(data):
+    # Paths to `.npy` files are memory-mapped, so samples are only read when a chunk is processed
+    if isinstance(data, (str, os.PathLike)):
+        return np.load(data, mmap_mode = "r")
+    return data
+
+def peak_memory_mb():
+    # Peak resident memory of the process in MB, or None if it is not available
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+class ChunkProgress:
+    """Prints the number of samples processed, throughput and peak memory while data is evaluated in chunks."""
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self._start = time.perf_counter()
+
+    def update(self, nsamples):
+        self.done += nsamples
+        elapsed = max(time.perf_counter() - self._start, 1e-9)
+        status = f"[{self.done}/{self.total}] {100 * self.done / max(self.total, 1):.0f}% - {self.done / elapsed:.0f} samples/s"
+        peak = peak_memory_mb()
+        if peak is not None:
+            status += f" - peak memory: {peak:.0f} MB"
+        print(status)
+
+def save_npz(path, **arrays):
+    # Uncompressed .npz, written to a temporary file in the same directory and then renamed,
+    # so an interrupted save never leaves a truncated file behind
+    fd, tmp_path = tempfile.mkstemp(dir = os.path.dirname(os.path.abspath(path)), suffix = ".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def npz_memmap(path, name, mmap_mode = "r"):
+    # Memory-map array `name` of an uncompressed .npz file. np.load ignores mmap_mode for .npz files, 
+    # but members are stored as plain .npy files, so the array data can be mapped at its offset in the archive
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name + ".npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError(f"'{name}' is compressed in {path} and cannot be memory-mapped")
+    with open(path, "rb") as f:
+        f.seek(info.header_offset + 26) # file name and extra field lengths in the local file header
+        name_length, extra_length = struct.unpack("<HH", f.read(4))
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    return np.memmap(path, dtype = dtype, mode = mmap_mode, shape = shape, offset = offset, order = "F" if fortran_order else "C")
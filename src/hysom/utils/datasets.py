@@ -1,23 +1,48 @@
+import os
 import json
 import numpy as np 
 from importlib import resources
+from functools import lru_cache
 import warnings
-import csv
-from datetime import datetime
-# __QT_watershed_01191000_filename = "QT_01191000.json"
+from hysom.utils.aux_funcs import save_npz
 # __events_watershed_01191000_filename = "events_01191000.json"
 
-__QT_watershed_01191000_filename = "QTdata_01191000.csv"
+__QT_watershed_01191000_filename = "QT_01191000.json"
 __events_watershed_01191000_filename = "event_times_01191000.csv"
+__labeled_loops_filename = "classified_loops.json"
 
-def get_labeled_loops():
-    ref = resources.files("hysom.data")
-    loops_data_path = ref.joinpath("classified_loops.json")
+# Bump when the layout of the cached arrays changes, so that old cache files are parsed again
+__cache_version = 2
 
-    with loops_data_path.open('r', encoding = 'utf-8') as f:
-        data = json.load(f)
+# Cubic meters per cubic foot, the discharge is shipped in cfs and returned in cms
+__cms_per_cfs = 0.028316846592
+
+def get_labeled_loops(return_codes: bool = False) -> tuple:
+    """
+    Returns the sample hysteresis loops and their class labels.
+
+    Parameters
+    ----------
+    return_codes : bool, optional (default=False)
+        If True, integer class codes and the class names are returned instead of the labels.
+
+    Returns
+    -------
+    loops : np.ndarray
+        Loops with shape `(340, 100, 2)`.
 
-    return np.array(data["arrays"]), data["classes"]
+    labels : np.ndarray
+        Class label (string) of each loop. Only returned if `return_codes` is False.
+
+    codes, class_names : np.ndarray
+        Class code of each loop and the name of each code, so that `class_names[codes]` are the labels.
+        Only returned if `return_codes` is True.
+    """
+    data = _load_dataset(__labeled_loops_filename, _parse_labeled_loops)
+    loops = data["loops"].copy()
+    if return_codes:
+        return loops, data["codes"].copy(), data["class_names"].copy()
+    return loops, data["class_names"][data["codes"]]
 
 
 # def get_watershed_timeseries():
@@ -39,37 +64,94 @@ def get_sample_data():
     return get_labeled_loops()[0]
 
 
-def get_01191000_qt_data():
-    ref = resources.files("hysom.data")
-    QT_data_file_path = ref.joinpath(__QT_watershed_01191000_filename)
-    with QT_data_file_path.open("r", encoding = "utf-8") as f:
-        reader = csv.reader(f)
-        header = True
-        data = {}
-        for row in reader:
-            if header:
-                for field in row:
-                    data[field] = []
-                header = False
-                continue
-            for key, val in zip(data.keys(), row):
-                if key == "datetime":
-                    val = datetime.strptime(val,"%Y-%m-%d %H:%M:%S%z")
-                else:
-                    val = float(val)
-                data[key].append(val)
+def get_01191000_qt_data() -> dict:
+    """
+    Returns the discharge and turbidity time series of USGS site 01191000.
+
+    Returns
+    -------
+    dict
+        `"datetime"`: UTC timestamps as a `datetime64[s]` array; `"Qcms"`: discharge in cubic meters per second;
+        and `"turb"`: turbidity in NTU, as float arrays. The dictionary can be passed directly to `pandas.DataFrame`.
+    """
+    data = _load_dataset(__QT_watershed_01191000_filename, _parse_qt_data)
+    return {key: values.copy() for key, values in data.items()}
+
+def get_01191000_events_data() -> np.ndarray:
+    """
+    Returns the start and end times of the hydrologic events of USGS site 01191000.
+
+    Returns
+    -------
+    np.ndarray
+        UTC timestamps as a `datetime64[s]` array with shape `(nevents, 2)`. Each row is an event `(start, end)`.
+    """
+    return _load_dataset(__events_watershed_01191000_filename, _parse_events_data)["times"].copy()
+
+def get_cache_dir() -> str:
+    """
+    Directory where the parsed datasets are cached.
+
+    It is `$HYSOM_CACHE_DIR` if set, otherwise `$XDG_CACHE_HOME/hysom` (`~/.cache/hysom` by default).
+    The cache can be safely deleted; it is rebuilt on the next load.
+    """
+    cache_dir = os.environ.get("HYSOM_CACHE_DIR")
+    if cache_dir:
+        return cache_dir
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "hysom")
+
+@lru_cache(maxsize = None)
+def _load_dataset(filename, parse):
+    # Arrays parsed from package data file `filename`. The text file is only parsed the first time: the arrays are
+    # stored in an .npz file in the cache directory, which is used while the size and modification time of the
+    # source file do not change. Callers must copy the returned arrays, which are shared within the process.
+    ref = resources.files("hysom.data").joinpath(filename)
+    cache_path = os.path.join(get_cache_dir(), os.path.splitext(filename)[0] + ".npz")
+    with resources.as_file(ref) as path:
+        stat = os.stat(path)
+        stamp = np.array([__cache_version, stat.st_size, stat.st_mtime_ns], dtype = np.int64)
+        try:
+            with np.load(cache_path) as cached:
+                if np.array_equal(cached["stamp"], stamp):
+                    return {key: cached[key] for key in cached.files if key != "stamp"}
+        except (OSError, KeyError, ValueError):
+            pass # missing, outdated or unreadable cache
+        data = parse(path)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok = True)
+        save_npz(cache_path, stamp = stamp, **data)
+    except OSError:
+        pass # read-only cache directory: the data is parsed again in the next process
     return data
 
-def get_01191000_events_data():
-    ref = resources.files("hysom.data")
-    events_data_file_path = ref.joinpath(__events_watershed_01191000_filename)
-    with events_data_file_path.open("r", encoding = "utf-8") as f:
-        reader = csv.reader(f)
-        header = True
-        times = []
-        for row in reader:
-            if header:
-                header = False
-                continue
-            times.append(tuple(datetime.strptime(item, "%Y-%m-%d %H:%M:%S%z") for item in row))
-    return times
\ No newline at end of file
+def _parse_labeled_loops(path):
+    with open(path, "r", encoding = "utf-8") as f:
+        data = json.load(f)
+    class_names, codes = np.unique(np.array(data["classes"]), return_inverse = True)
+    return {"loops": np.array(data["arrays"], dtype = np.float64), "codes": codes.astype(np.int64), "class_names": class_names}
+
+def _parse_qt_data(path):
+    # {"Qcfs": {epoch_ms: value}, "turb": {epoch_ms: value}}, both series with the same timestamps
+    with open(path, "r", encoding = "utf-8") as f:
+        data = json.load(f)
+    keys = list(data["Qcfs"])
+    qcfs = np.array(list(data["Qcfs"].values()), dtype = np.float64) # null values become NaN
+    turb = np.array([data["turb"].get(key) for key in keys], dtype = np.float64)
+    times = np.array(list(map(int, keys)), dtype = np.int64).astype("datetime64[ms]").astype("datetime64[s]")
+    return {"datetime": times, "Qcms": qcfs * __cms_per_cfs, "turb": turb}
+
+def _parse_events_data(path):
+    table = np.loadtxt(path, delimiter = ",", dtype = str, skiprows = 1, ndmin = 2, encoding = "utf-8")
+    return {"times": _parse_timestamps(table.ravel()).reshape(table.shape)}
+
+def _parse_timestamps(strings):
+    # Vectorized parse of "%Y-%m-%d %H:%M:%S%z" timestamps (e.g. "2016-06-04 08:08:46+0000") to UTC datetime64[s]
+    strings = np.ascontiguousarray(strings, dtype = "U24")
+    if len(strings) and not np.all(np.char.str_len(strings) == 24):
+        raise ValueError("timestamps must have the format 'YYYY-MM-DD HH:MM:SS+HHMM'")
+    chars = strings.view("U1").reshape(len(strings), 24)
+    local = chars[:, :19].copy().view("U19").ravel().astype("datetime64[s]")
+    sign = np.where(chars[:, 19] == "-", -1, 1)
+    hhmm = chars[:, 20:].copy().view("U4").ravel().astype(np.int64)
+    offset = sign * (hhmm // 100 * 3600 + hhmm % 100 * 60)
+    return local - offset.astype("timedelta64[s]")
@@ -1,14 +1,17 @@
+from __future__ import annotations
 import numpy as np
 import numpy.typing as npt
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure as mplFigure
-from matplotlib.colors import Colormap, BoundaryNorm, Normalize
-from matplotlib.cm import ScalarMappable
 from collections import defaultdict
 from string import ascii_uppercase
-from typing import Iterable, Tuple, Callable, Any, Literal
-from hysom import HSOM
+from typing import Iterable, Tuple, Callable, Any, Literal, TYPE_CHECKING
 from hysom.utils.aux_funcs import split_range_auto
+from hysom.projection import Projection
+
+# matplotlib is imported by the functions that draw, so importing this module stays cheap
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure as mplFigure
+    from matplotlib.colors import Colormap
+    from hysom import HSOM
 
 
 def plot_map(prototypes, axs = None, loop_cmap = "inferno", sample_loop_coords = (0,0), coordinates_style: Literal["alphanumeric", "matrix"] = "alphanumeric"):
@@ -53,6 +56,7 @@ def plot_map(prototypes, axs = None, loop_cmap = "inferno", sample_loop_coords =
 
 
 def _make_figure(height, width, figsize = None)-> Tuple[mplFigure, np.ndarray]:
+    import matplotlib.pyplot as plt
     if figsize is None:
         figsize = (width + 1,height)
     fig, axs = plt.subplots(height,width, figsize = figsize, squeeze=False)
@@ -91,7 +95,7 @@ def _add_map_coordinates(axs, style: Literal["alphanumeric", "matrix"]):
         axs[0, col].tick_params(bottom = False, top = True, labeltop=True, labelbottom=False, length = v*0.5, labelsize = v)
 
 def _add_sample_loop(fig, sample_loop, cmap):
-    
+    import matplotlib.pyplot as plt
     ax = fig.add_axes([0.78, 0.76, 0.10, 0.10])
     axcb = fig.add_axes([0.79, 0.87, 0.08, 0.01])
     sc = ax.scatter(sample_loop[:,0], sample_loop[:,1], c = list(range(len(sample_loop))), s = 2, cmap = cmap)
@@ -158,11 +162,159 @@ def heat_map(som: HSOM, loops: Iterable, values: Iterable,
                                     )
     _clear_unmatched_bmus(axs, matched_bmus =coloring_vals_dict.keys())
 
+def plot_map_canvas(prototypes: np.ndarray, 
+                    values: Iterable | np.ndarray | None = None, 
+                    bmus: np.ndarray | None = None,
+                    ax = None,
+                    agg_method: Callable[[Any], float] = np.median,
+                    loop_cmap: str | Colormap = "inferno",
+                    cmap: str | Colormap = "Oranges", 
+                    minval: float | None = None, 
+                    maxval: float | None = None, 
+                    scale: str = "linear",
+                    colorbar_label: str | None = None,
+                    sample_loop_coords: tuple = (0,0),
+                    coordinates_style: Literal['alphanumeric', 'matrix'] = "alphanumeric",
+                    linewidth: float = 1.5,
+                    rasterized: bool = False):
+    """
+    Plot the map of prototypes, and optionally a heat map, on a single axes.
+
+    Same figure as `plot_map` and `heat_map`, but all prototypes are drawn as one `LineCollection` on a grid of
+    unit cells and the heat map is a single `imshow` background, instead of one axes per unit. This keeps
+    drawing time and memory low for large maps and when exporting many figures. BMUs are not computed here:
+    pass them precomputed (e.g. `som.get_BMUs(loops)`), or pass values already aggregated by unit
+    (e.g. `som.frequency_matrix(loops)`).
+
+    Parameters
+    ----------
+    prototypes : np.ndarray
+        prototypes as given by HSOM.get_prototypes()
+
+    values : array-like, optional
+        Either one value per sample, aggregated by unit with `agg_method` (requires `bmus`), or a
+        `(height, width)` matrix of unit values, with NaN for units without value (as returned by
+        `HSOM.attribute_matrix`). If None, only the prototypes are drawn.
+
+    bmus : np.ndarray, optional
+        BMU of every sample, as `(row, col)` coordinates with shape `(nsamples, 2)` (as returned by
+        `HSOM.get_BMUs`) or as flat unit indices with shape `(nsamples,)`.
+
+    ax : matplotlib axes, optional
+        Axes to draw on. If None, a new figure is created, with the colorbar and a sample loop on the right margin.
+
+    agg_method : callable, optional (default = np.median)
+        Function applied to the values of the samples of each unit. Use `len` for a frequency heat map.
+
+    loop_cmap : str or colormap (optional, default = "inferno")
+        Colormap of the prototypes, from start to end of the loop.
+
+    cmap, minval, maxval, scale, colorbar_label
+        Heat map colormap and color scale, as in `heat_map`.
+
+    sample_loop_coords : tuple, optional (default = (0,0))
+        Unit of the sample loop drawn in the upper right corner of a new figure.
+
+    coordinates_style : {"alphanumeric", "matrix"}, optional (default = "alphanumeric")
+        Style of the unit coordinates.
+
+    linewidth : float, optional (default = 1.5)
+        Width of the prototype lines.
+
+    rasterized : bool, optional (default = False)
+        If True, prototypes are rasterized when saving to vector formats (PDF, SVG), which keeps files small for large maps.
+
+    Returns
+    -------
+    matplotlib axes
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    prototypes = np.asarray(prototypes)
+    height, width, seq_len = prototypes.shape[:3]
+    new_figure = ax is None
+    if new_figure:
+        fig, ax = plt.subplots(figsize = (width + 1, height))
+        fig.subplots_adjust(right = 0.75)
+    fig = ax.figure
+
+    colors = plt.get_cmap(loop_cmap)(np.tile(np.linspace(0.0, 1.0, seq_len - 1), height * width))
+    if values is not None:
+        unit_values, matched_values = _unit_values(values, bmus, (height, width), agg_method)
+        if isinstance(cmap, str):
+            cmap = plt.get_cmap(cmap)
+        norm = _colorNorm(matched_values, ncolors = cmap.N, minval = minval, maxval = maxval, scale = scale)
+        ax.imshow(np.ma.masked_invalid(unit_values), cmap = cmap, norm = norm, extent = (0, width, height, 0), 
+                  interpolation = "nearest", zorder = 0)
+        unmatched = np.repeat(np.isnan(unit_values).ravel(), seq_len - 1)
+        colors[unmatched] = (0.5, 0.5, 0.5, 0.1) # grey, as in `heat_map`
+        _make_colorbar(fig, norm, cmap, colorbar_label, ax = None if new_figure else ax)
+
+    ax.add_collection(LineCollection(_canvas_segments(prototypes), colors = colors, linewidths = linewidth, rasterized = rasterized))
+    ax.set_xlim(0, width)
+    ax.set_ylim(height, 0)
+    ax.set_aspect("equal")
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    _add_canvas_coordinates(ax, height, width, style = coordinates_style)
+    if new_figure:
+        _add_sample_loop(fig, prototypes[sample_loop_coords], cmap = loop_cmap)
+    return ax
+
+def _canvas_segments(prototypes):
+    # Line segments of all prototypes, each loop (normalized to [0, 1]) scaled into its unit cell 
+    # ([col, col+1] x [row, row+1], with rows growing downwards) with a small margin
+    height, width, seq_len = prototypes.shape[:3]
+    rows, cols = np.meshgrid(np.arange(height), np.arange(width), indexing = "ij")
+    x = cols[..., None] + (prototypes[..., 0] + 0.05) / 1.1
+    y = rows[..., None] + 1 - (prototypes[..., 1] + 0.05) / 1.1
+    points = np.stack((x, y), axis = -1).reshape(height * width, seq_len, 2)
+    return np.stack((points[:, :-1], points[:, 1:]), axis = 2).reshape(-1, 2, 2)
+
+def _unit_values(values, bmus, shape, agg_method):
+    # Heat map value of every unit (NaN if none) and the list of values of the matched units
+    if bmus is None:
+        unit_values = np.asarray(values)
+        if unit_values.shape != shape:
+            raise ValueError(f"values must have shape {shape} when bmus is not given, not {unit_values.shape}")
+        matched = ~np.isnan(unit_values) if unit_values.dtype.kind == "f" else np.ones(shape, dtype = bool)
+        return unit_values.astype(np.float64), unit_values[matched].tolist()
+
+    bmus = np.asarray(bmus)
+    flat_bmus = np.ravel_multi_index(tuple(bmus.T), shape) if bmus.ndim == 2 else bmus
+    if not isinstance(values, np.ndarray):
+        values = np.asarray(list(values))
+    if len(values) != len(flat_bmus):
+        raise ValueError(f"values and bmus must have the same length ({len(values)} != {len(flat_bmus)})")
+    unit_values = np.full(shape, np.nan)
+    matched = []
+    for bmu, idxs in Projection(flat_bmus, np.zeros(len(flat_bmus)), *shape).groups():
+        matched.append(agg_method(values[idxs]))
+        unit_values[bmu] = matched[-1]
+    return unit_values, matched
+
+def _add_canvas_coordinates(ax, height, width, style: Literal["alphanumeric", "matrix"]):
+    h, v = ax.figure.get_size_inches()
+    if style == "alphanumeric":
+        row_coords = ascii_uppercase
+        col_offset = 1
+    else:
+        row_coords = range(height)
+        col_offset = 0
+    row_labels = [str(label) for _, label in zip(range(height), row_coords)]
+    ax.set_yticks(ticks = np.arange(len(row_labels)) + 0.5, labels = row_labels)
+    ax.set_xticks(ticks = np.arange(width) + 0.5, labels = [str(col + col_offset) for col in range(width)])
+    ax.tick_params(axis = "y", length = h*0.5, labelsize = v)
+    ax.tick_params(axis = "x", bottom = False, top = True, labeltop = True, labelbottom = False, length = v*0.5, labelsize = v)
+
 def _groupby_bmu(som, loops, vals):
-    bmus_vals = [(som.get_BMU(loop), val) for loop, val in zip(loops,vals)]
+    # Uses the cached projection of `loops`, so several heat maps of the same loops share one BMU search
+    if not isinstance(vals, np.ndarray):
+        vals = list(vals)
     bmu_vals_dict = defaultdict(list)
-    for bmu, val in bmus_vals:
-        bmu_vals_dict[bmu].append(val)
+    for bmu, idxs in som.project(loops).groups():
+        bmu_vals_dict[bmu] = [vals[idx] for idx in idxs]
 
     return bmu_vals_dict
 
@@ -180,6 +332,7 @@ def _clear_unmatched_bmus(axs, matched_bmus):
                 axs[i,j].collections[0].set_alpha(0.1)
 
 def _set_values_based_background(axs, bmus, values, cmap, minval, maxval, scale, colorbar_label):
+    import matplotlib.pyplot as plt
     if isinstance(cmap, str):
         cmap = plt.get_cmap(cmap)
 
@@ -187,19 +340,27 @@ def _set_values_based_background(axs, bmus, values, cmap, minval, maxval, scale,
     for bmu, val in zip(bmus, values):
         color = cmap(norm(val))
         axs[bmu].set_facecolor(color)
-    _make_colorbar(axs, norm, cmap, colorbar_label)
+    _make_colorbar(axs[0,0].figure, norm, cmap, colorbar_label)
 
-def _make_colorbar(axs, norm, cmap, colorbar_label):
+def _make_colorbar(fig, norm, cmap, colorbar_label, ax = None):
+    # Colorbar on the right margin of a figure made by `_make_figure`, or next to `ax` if given
+    from matplotlib.cm import ScalarMappable
+    from matplotlib.colors import BoundaryNorm
     if colorbar_label is None:
         colorbar_label = "Values"
     scalarmappable = ScalarMappable(norm=norm, cmap=cmap)
-    ax_cb = axs[0,0].figure.add_axes([0.77,0.11,0.025,0.5])
-    cax = plt.colorbar(scalarmappable, cax = ax_cb)
+    if ax is None:
+        ax_cb = fig.add_axes([0.77,0.11,0.025,0.5])
+        cax = fig.colorbar(scalarmappable, cax = ax_cb)
+    else:
+        cax = fig.colorbar(scalarmappable, ax = ax)
+        ax_cb = cax.ax
     ax_cb.set_ylabel(colorbar_label)
     if isinstance(norm, BoundaryNorm): #Discrete colorbar
         _displace_colorbar_ticks(ax_cb, norm)
 
 def _colorNorm(values, ncolors, minval, maxval, scale):
+    from matplotlib.colors import BoundaryNorm, Normalize
     if minval is None: minval = min(values) 
     if maxval is None: maxval = max(values)
     bounds = _colorbounds(values, minval, maxval, scale)
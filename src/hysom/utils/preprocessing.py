@@ -0,0 +1,181 @@
+import numpy as np
+from typing import Iterator, Tuple
+from hysom.validators import validate_series, validate_seq_len, validate_chunk_size
+
+def event_bounds(times: np.ndarray, events: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Locate events in a time series by binary search on its timestamps.
+
+    Parameters
+    ----------
+    times : np.ndarray
+        Timestamps of the series (e.g. `datetime64`), sorted in increasing order.
+
+    events : np.ndarray
+        Event windows with shape `(nevents, 2)`, one `(start, end)` row per event, comparable with `times`.
+
+    Returns
+    -------
+    begin, stop : np.ndarray
+        Index bounds of each event: the records of event `i` are `begin[i]:stop[i]`, i.e. the records with
+        `start <= time <= end` (both ends included, as in label-based slicing with pandas).
+    """
+    events = np.asarray(events)
+    begin = np.searchsorted(times, events[:, 0], side = "left")
+    stop = np.searchsorted(times, events[:, 1], side = "right")
+    return begin, np.maximum(stop, begin)
+
+def resample_loops(values: np.ndarray, begin: np.ndarray, stop: np.ndarray, seq_len: int = 100) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Min-max normalize and resample a batch of events to loops of `seq_len` points.
+
+    Each event is normalized to [0, 1] in each variable and then resampled at `seq_len` points evenly spaced
+    along its path (arc length) in the normalized plane, so the loops keep their shape but not the timing of
+    the records. All events are processed at once, without a Python loop over events.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Series values with shape `(ntimes, 2)`, typically (discharge, concentration).
+
+    begin, stop : np.ndarray
+        Index bounds of the events, as returned by `event_bounds`.
+
+    seq_len : int, optional (default=100)
+        Number of points of each loop.
+
+    Returns
+    -------
+    loops : np.ndarray
+        Loops with shape `(nvalid, seq_len, 2)`.
+
+    valid : np.ndarray
+        Boolean mask of the events that were resampled. Events with less than two records, with a constant
+        variable or with missing (NaN) values cannot be normalized and are left out.
+    """
+    begin, stop = np.asarray(begin, dtype = np.int64), np.asarray(stop, dtype = np.int64)
+    valid = stop - begin >= 2
+    if not np.any(valid):
+        return np.empty((0, seq_len, values.shape[1])), valid
+
+    points, starts = _gather_segments(values, begin[valid], stop[valid])
+    lengths = np.diff(starts)
+    mins = np.minimum.reduceat(points, starts[:-1], axis = 0)
+    ranges = np.maximum.reduceat(points, starts[:-1], axis = 0) - mins
+    normalizable = np.all(np.isfinite(ranges) & (ranges > 0), axis = 1) # False for constant variables, NaN and inf
+    valid[valid] = normalizable
+    if not np.any(normalizable):
+        return np.empty((0, seq_len, values.shape[1])), valid
+
+    # Drop the events that cannot be normalized before computing path lengths: their NaN or inf steps
+    # would otherwise propagate through the cumulative sum to every later event of the batch
+    keep = np.repeat(normalizable, lengths)
+    points, lengths = points[keep], lengths[normalizable]
+    mins, ranges = mins[normalizable], ranges[normalizable]
+    starts = np.zeros(len(lengths) + 1, dtype = np.int64)
+    np.cumsum(lengths, out = starts[1:])
+    points = (points - np.repeat(mins, lengths, axis = 0)) / np.repeat(ranges, lengths, axis = 0)
+
+    # Cumulative path length over the whole batch. Steps are zero at the first point of each event,
+    # so the path of every event is a non-decreasing stretch of `arc`
+    steps = np.zeros(len(points))
+    steps[1:] = np.sqrt(np.sum(np.diff(points, axis = 0)**2, axis = 1))
+    steps[starts[:-1]] = 0.0
+    arc = np.cumsum(steps)
+    first, last = arc[starts[:-1]], arc[starts[1:] - 1]
+    targets = first[:, None] + (last - first)[:, None] * np.linspace(0.0, 1.0, seq_len)
+
+    # Linear interpolation on each event's own path (same as np.interp on the path length)
+    lower = np.searchsorted(arc, targets, side = "right") - 1
+    lower = np.clip(lower, starts[:-1, None], starts[1:, None] - 2)
+    span = arc[lower + 1] - arc[lower]
+    weights = np.divide(targets - arc[lower], span, out = np.ones_like(targets), where = span > 0)
+    weights = np.clip(weights, 0.0, 1.0)[..., None]
+    loops = points[lower] * (1.0 - weights) + points[lower + 1] * weights
+    return loops, valid
+
+def iter_event_loops(times: np.ndarray, 
+                     values: np.ndarray, 
+                     events: np.ndarray, 
+                     seq_len: int = 100, 
+                     chunk_size: int = 1024) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Turn the events of a long time series into normalized loops, `chunk_size` events at a time.
+
+    Events are located with `event_bounds` and every chunk is processed with `resample_loops`, so memory use
+    depends on the chunk size and not on the number of events. `values` can be a memory-mapped array.
+
+    Parameters
+    ----------
+    times : np.ndarray
+        Timestamps of the series, with shape `(ntimes,)`, sorted in increasing order.
+
+    values : np.ndarray
+        Series values with shape `(ntimes, 2)`, typically (discharge, concentration).
+
+    events : np.ndarray
+        Event windows with shape `(nevents, 2)`, as returned by `get_01191000_events_data`.
+
+    seq_len : int, optional (default=100)
+        Number of points of each loop.
+
+    chunk_size : int, optional (default=1024)
+        Number of events processed at a time.
+
+    Yields
+    ------
+    event_indices : np.ndarray
+        Indices (rows of `events`) of the events in the chunk that could be turned into loops.
+
+    loops : np.ndarray
+        Their loops, with shape `(len(event_indices), seq_len, 2)`.
+
+    Examples
+    --------
+    >>> qt = get_01191000_qt_data()
+    >>> values = np.column_stack((qt["Qcms"], qt["turb"]))
+    >>> for idxs, loops in iter_event_loops(qt["datetime"], values, get_01191000_events_data()):
+    ...     som.partial_fit(loops, max_iter = max_iter)
+    """
+    times, values, events = np.asarray(times), np.asarray(values), np.asarray(events)
+    validate_series(times, values, events)
+    validate_seq_len(seq_len)
+    validate_chunk_size(chunk_size)
+
+    begin, stop = event_bounds(times, events)
+    for start in range(0, len(events), chunk_size):
+        end = min(start + chunk_size, len(events))
+        loops, valid = resample_loops(values, begin[start:end], stop[start:end], seq_len)
+        yield start + np.flatnonzero(valid), loops
+
+def extract_event_loops(times: np.ndarray, 
+                        values: np.ndarray, 
+                        events: np.ndarray, 
+                        seq_len: int = 100, 
+                        chunk_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Turn all the events of a time series into normalized loops ready to be used with `HSOM`.
+
+    Same as `iter_event_loops`, with the chunks concatenated.
+
+    Returns
+    -------
+    event_indices : np.ndarray
+        Indices of the events that could be turned into loops.
+
+    loops : np.ndarray
+        Loops with shape `(len(event_indices), seq_len, 2)`.
+    """
+    chunks = list(iter_event_loops(times, values, events, seq_len, chunk_size))
+    if not chunks:
+        return np.empty(0, dtype = np.int64), np.empty((0, seq_len, np.shape(values)[1]))
+    event_indices, loops = zip(*chunks)
+    return np.concatenate(event_indices), np.concatenate(loops)
+
+def _gather_segments(values, begin, stop):
+    # Records of all the events stacked in one array (events may overlap), and the start of each event in it
+    lengths = stop - begin
+    starts = np.zeros(len(lengths) + 1, dtype = np.int64)
+    np.cumsum(lengths, out = starts[1:])
+    idxs = np.arange(starts[-1]) + np.repeat(begin - starts[:-1], lengths)
+    return np.asarray(values[idxs], dtype = np.float64), starts
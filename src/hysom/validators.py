@@ -1,4 +1,6 @@
+import os
 from typing import Union, Callable
+from numbers import Integral, Real
 import numpy as np
 
 
@@ -31,4 +33,67 @@ def validate_prototypes_initialization(width, height, input_dim, prototypes):
 
     if prototypes.shape != (height, width) + input_dim:
          raise ValueError(f"'prototypes' dimension mismatch. 'prototypes' should be a (height, width, input_dim): ({(height, width) + input_dim}) numpy array instead of {prototypes.shape}")
-         
\ No newline at end of file
+
+def validate_window(window):
+    if window is None:
+        return
+    if isinstance(window, bool) or not isinstance(window, Real):
+        raise TypeError(f"window must be None, int or float, not {type(window)}")
+    if not isinstance(window, Integral) and not (0 <= window <= 1):
+        raise ValueError("window must be between 0 and 1 when given as a float")
+    if isinstance(window, Integral) and window < 0:
+        raise ValueError("window must be a non-negative integer")
+
+def validate_option(value, options, name):
+    if value not in options:
+        raise ValueError(f"{name} must be one of {options}, not {value!r}")
+
+def validate_dtype(dtype):
+    if np.dtype(dtype) not in (np.float32, np.float64):
+        raise ValueError(f"dtype must be np.float32 or np.float64, not {dtype}")
+
+def validate_non_negative(value, name):
+    if isinstance(value, bool) or not isinstance(value, Real) or value < 0:
+        raise ValueError(f"{name} must be a non-negative number, not {value!r}")
+
+def validate_stream_params(batch, input_dim, max_iter):
+    if not isinstance(batch, np.ndarray):
+        raise TypeError("batch must be a numpy.ndarray")
+    if batch.shape[1:] != tuple(input_dim):
+        raise ValueError(f"batch samples must have shape {tuple(input_dim)}, not {batch.shape[1:]}")
+    if isinstance(max_iter, bool) or not isinstance(max_iter, Integral) or max_iter <= 0:
+        raise ValueError("max_iter must be a positive integer")
+
+def validate_chunk_size(chunk_size):
+    if isinstance(chunk_size, bool) or not isinstance(chunk_size, Integral) or chunk_size <= 0:
+        raise ValueError(f"chunk_size must be a positive integer, not {chunk_size!r}")
+
+def validate_k(k, nunits):
+    if isinstance(k, bool) or not isinstance(k, Integral) or not (1 <= k <= nunits):
+        raise ValueError(f"k must be an integer between 1 and the number of units ({nunits}), not {k!r}")
+
+def validate_checkpoint_params(checkpoint_path, checkpoint_every):
+    if checkpoint_path is not None and not isinstance(checkpoint_path, (str, os.PathLike)):
+        raise TypeError(f"checkpoint_path must be None or a path, not {type(checkpoint_path)}")
+    if isinstance(checkpoint_every, bool) or not isinstance(checkpoint_every, Integral) or checkpoint_every <= 0:
+        raise ValueError(f"checkpoint_every must be a positive integer, not {checkpoint_every!r}")
+
+def validate_series(times, values, events):
+    if times.ndim != 1:
+        raise ValueError(f"times must be a 1D array, not an array with shape {times.shape}")
+    if values.ndim != 2 or len(values) != len(times):
+        raise ValueError(f"values must have shape ({len(times)}, nvariables), not {values.shape}")
+    if events.ndim != 2 or events.shape[1] != 2:
+        raise ValueError(f"events must have shape (nevents, 2), not {events.shape}")
+    if np.any(times[1:] < times[:-1]):
+        raise ValueError("times must be sorted in increasing order")
+
+def validate_seq_len(seq_len):
+    if isinstance(seq_len, bool) or not isinstance(seq_len, Integral) or seq_len < 2:
+        raise ValueError(f"seq_len must be an integer greater than 1, not {seq_len!r}")
+
+def validate_batch_neighborhood(neighborhood_function):
+    # Batch prototypes are neighborhood-weighted means of the data, which need non-negative weights
+    # Compared by name, so that this module does not import the numba kernels
+    if getattr(neighborhood_function, "__name__", neighborhood_function) == "mexican_hat":
+        raise ValueError("neighborhood_function 'mexican_hat' has negative values and cannot be used for batch training")
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from hysom import HSOM
+from hysom.distributed import train_sharded
+from hysom.train_functions import mexican_hat
+
+@pytest.mark.parametrize("neighborhood_function", ["mexican_hat", mexican_hat])
+def test_batch_training_rejects_mexican_hat(neighborhood_function):
+    data = np.random.default_rng(0).random((20, 8, 2))
+    som = HSOM(width = 3, height = 3, input_dim = (8, 2), random_seed = 0)
+    with pytest.raises(ValueError, match = "mexican_hat"):
+        som.train(data, epochs = 1, algorithm = "batch", neighborhood_function = neighborhood_function)
+    with pytest.raises(ValueError, match = "mexican_hat"):
+        train_sharded(som, [data], epochs = 1, neighborhood_function = neighborhood_function)
+
+@pytest.mark.parametrize("neighborhood_function, neighborhood_cutoff", [("gaussian", 0.0), ("cutoff_gaussian", 0.1), ("bubble", 0.0)])
+def test_batch_accumulators_match_the_neighborhood_table(neighborhood_function, neighborhood_cutoff):
+    data = np.random.default_rng(1).random((200, 8, 2))
+    som = HSOM(width = 6, height = 4, input_dim = (8, 2), random_seed = 0)
+    som.random_init(data)
+    som.train(data, epochs = 1, algorithm = "batch", neighborhood_function = neighborhood_function,
+              neighborhood_cutoff = neighborhood_cutoff, track_errors = False)
+
+    numerator, denominator, units, _ = som._batch_accumulators(data, 1.5)
+
+    # reference: dense (nunits, nunits) table, row `c` holds the weights of every unit when `c` is the BMU
+    table = np.array([np.ravel(som._neighborhood_values(divmod(c, som.width), 1.5)) for c in range(24)])
+    table[np.abs(table) <= neighborhood_cutoff] = 0
+    onehot = np.eye(24)[units[:, 0]]
+    np.testing.assert_allclose(numerator, table.T @ onehot.T @ data.reshape(len(data), -1), rtol = 1e-12)
+    np.testing.assert_allclose(denominator, table.T @ onehot.sum(axis = 0), rtol = 1e-12)
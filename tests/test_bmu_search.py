@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from hysom import HSOM
+
+@pytest.fixture(scope = "module")
+def trained_som():
+    data = np.random.default_rng(0).random((80, 20, 2))
+    som = HSOM(width = 5, height = 4, input_dim = data.shape[1:], random_seed = 0)
+    som.train(data, epochs = 2, distance_function = "dtw")
+    return som
+
+@pytest.mark.parametrize("window", [None, 3, 0.25])
+def test_pruned_search_returns_the_exhaustive_result(trained_som, window):
+    som = trained_som
+    samples = np.random.default_rng(1).random((50, 20, 2))
+    som.window = window
+    results = {}
+    for bmu_search in ("pruned", "exhaustive"):
+        som.bmu_search = bmu_search
+        results[bmu_search] = (som._batch_bmus(samples), som._batch_k_bmus(samples, 3),
+                               [som.get_BMU(sample) for sample in samples[:5]])
+    (bmus, distances), (k_units, k_distances), single = results["pruned"]
+    (ref_bmus, ref_distances), (ref_k_units, ref_k_distances), ref_single = results["exhaustive"]
+    np.testing.assert_array_equal(bmus, ref_bmus)
+    np.testing.assert_allclose(distances, ref_distances, rtol = 1e-12)
+    np.testing.assert_array_equal(k_units, ref_k_units)
+    np.testing.assert_allclose(k_distances, ref_k_distances, rtol = 1e-12)
+    assert single == ref_single
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from hysom import HSOM
+
+class Interrupted(Exception):
+    pass
+
+def interrupt_after(som, nepochs):
+    # Stop the run once `nepochs` epochs are completed and checkpointed, as if the process had been killed
+    end_epoch = som._end_epoch
+    def _end_epoch(epoch, *args):
+        end_epoch(epoch, *args)
+        if epoch + 1 == nepochs:
+            raise Interrupted
+    som._end_epoch = _end_epoch
+
+@pytest.mark.parametrize("algorithm", ["online", "batch"])
+def test_resumed_run_equals_uninterrupted_run(tmp_path, algorithm):
+    data = np.random.default_rng(0).random((60, 10, 2))
+    params = dict(epochs = 4, algorithm = algorithm, track_errors = True, errors_data_fraction = 0.5, verbose = False)
+
+    uninterrupted = HSOM(width = 4, height = 3, input_dim = data.shape[1:], random_seed = 0)
+    uninterrupted.train(data, **params)
+
+    som = HSOM(width = 4, height = 3, input_dim = data.shape[1:], random_seed = 0)
+    interrupt_after(som, 2)
+    with pytest.raises(Interrupted):
+        som.train(data, checkpoint_path = str(tmp_path / "som.npz"), **params)
+    resumed = HSOM.load(str(tmp_path / "som.npz"))
+    resumed.train(data, checkpoint_path = str(tmp_path / "som.npz"), resume = True, **params)
+
+    np.testing.assert_array_equal(resumed.get_prototypes(), uninterrupted.get_prototypes())
+    np.testing.assert_array_equal(resumed.get_QE_history(), uninterrupted.get_QE_history())
+    np.testing.assert_array_equal(resumed.get_TE_history(), uninterrupted.get_TE_history())
+    np.testing.assert_array_equal(HSOM.load(str(tmp_path / "som.npz")).get_prototypes(), uninterrupted.get_prototypes())
@@ -0,0 +1,14 @@
+import numpy as np
+from hysom.utils.datasets import get_01191000_qt_data, get_01191000_events_data
+
+def test_01191000_qt_data(tmp_path, monkeypatch):
+    monkeypatch.setenv("HYSOM_CACHE_DIR", str(tmp_path))
+    qt = get_01191000_qt_data()
+
+    assert list(qt) == ["datetime", "Qcms", "turb"]
+    assert qt["datetime"].dtype == np.dtype("datetime64[s]")
+    assert all(len(values) == len(qt["datetime"]) for values in qt.values())
+    # first record of the first event, as shown in the "Preparing input data" tutorial
+    start = np.searchsorted(qt["datetime"], get_01191000_events_data()[0, 0])
+    assert qt["datetime"][start] == np.datetime64("2016-06-04T08:15:00")
+    np.testing.assert_allclose([qt["Qcms"][start], qt["turb"][start]], [0.213226, 2.3], atol = 1e-6)
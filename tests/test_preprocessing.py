@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+from hysom.utils.preprocessing import resample_loops, extract_event_loops
+
+def reference_loop(event, seq_len):
+    # Per-event min-max normalization and arc length resampling with np.interp, as in the "Preparing input data" tutorial
+    event = (event - event.min(axis = 0)) / (event.max(axis = 0) - event.min(axis = 0))
+    path = np.concatenate(([0.0], np.cumsum(np.sqrt(np.sum(np.diff(event, axis = 0)**2, axis = 1)))))
+    targets = np.linspace(0.0, path[-1], seq_len)
+    return np.stack([np.interp(targets, path, event[:, i]) for i in range(event.shape[1])], axis = 1)
+
+@pytest.mark.parametrize("bad_value", [np.nan, np.inf, "constant"])
+def test_bad_event_in_the_middle_of_a_chunk(bad_value):
+    rng = np.random.default_rng(0)
+    values = rng.random((40, 2))
+    if bad_value == "constant":
+        values[10:20, 1] = 3.0
+    else:
+        values[12, 0] = bad_value
+    begin, stop = np.arange(0, 40, 10), np.arange(10, 41, 10)
+
+    loops, valid = resample_loops(values, begin, stop, seq_len = 50)
+
+    assert valid.tolist() == [True, False, True, True]
+    expected = [reference_loop(values[b:s], 50) for b, s in zip(begin[valid], stop[valid])]
+    np.testing.assert_allclose(loops, expected, rtol = 0, atol = 1e-12)
+
+def test_results_do_not_depend_on_chunk_size():
+    rng = np.random.default_rng(1)
+    times = np.arange(500)
+    values = rng.random((500, 2))
+    values[100:130, 0] = 1.0
+    values[260, 1] = np.nan
+    starts = np.sort(rng.integers(0, 450, 40))
+    events = np.stack((starts, starts + rng.integers(0, 50, 40)), axis = 1)
+
+    idxs, loops = extract_event_loops(times, values, events, seq_len = 20, chunk_size = 1)
+    for chunk_size in (3, 40):
+        chunk_idxs, chunk_loops = extract_event_loops(times, values, events, seq_len = 20, chunk_size = chunk_size)
+        assert np.array_equal(idxs, chunk_idxs)
+        np.testing.assert_allclose(chunk_loops, loops, rtol = 0, atol = 1e-12)
+
+def test_importing_preprocessing_does_not_import_numba():
+    # The pipeline is plain numpy; the kernels are only imported when a SOM is needed
+    code = "import sys, hysom.utils.preprocessing; assert 'numba' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check = True, env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)})
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from hysom import HSOM
+
+def make_data(nsamples = 60, seq_len = 10, seed = 0):
+    return np.random.default_rng(seed).random((nsamples, seq_len, 2))
+
+def trained_prototypes(data, **train_kwargs):
+    som = HSOM(width = 4, height = 3, input_dim = data.shape[1:], random_seed = 0)
+    som.train(data, **{"epochs": 3, "verbose": False, **train_kwargs})
+    return som.get_prototypes()
+
+@pytest.mark.parametrize("algorithm", ["online", "batch"])
+def test_tracking_errors_does_not_change_the_map(algorithm):
+    data = make_data()
+    untracked = trained_prototypes(data, algorithm = algorithm, track_errors = False)
+    tracked = trained_prototypes(data, algorithm = algorithm, track_errors = True, errors_data_fraction = 0.5)
+    np.testing.assert_array_equal(tracked, untracked)
+
+@pytest.mark.parametrize("method", ["train", "partial_fit"])
+def test_read_only_map_is_left_unchanged(method):
+    data = make_data()
+    som = HSOM(width = 4, height = 3, input_dim = data.shape[1:], random_seed = 0)
+    som.train(data, epochs = 1, distance_function = "euclidean", window = None, verbose = False)
+    prototypes = som.get_prototypes().copy()
+    prototypes.flags.writeable = False
+    som.set_init_prototypes(prototypes)
+    settings = (som.initial_sigma, som.distance_function, som.window, som.neighborhood_function)
+
+    with pytest.raises(ValueError, match = "read-only"):
+        if method == "train":
+            som.train(data, epochs = 1, distance_function = "dtw", window = 2, neighborhood_function = "bubble", initial_sigma = 9.0)
+        else:
+            som.partial_fit(data, max_iter = 100, distance_function = "dtw", window = 2, neighborhood_function = "bubble", initial_sigma = 9.0)
+    assert (som.initial_sigma, som.distance_function, som.window, som.neighborhood_function) == settings
+
+def test_partial_fit_once_per_epoch_equals_train():
+    data = make_data()
+    som = HSOM(width = 4, height = 3, input_dim = data.shape[1:], random_seed = 0)
+    som.train(data, epochs = 3, verbose = False)
+
+    streamed = HSOM(width = 4, height = 3, input_dim = data.shape[1:], random_seed = 0)
+    for _ in range(3):
+        streamed.partial_fit(data, max_iter = 3 * len(data))
+    np.testing.assert_array_equal(streamed.get_prototypes(), som.get_prototypes())
+
+@pytest.mark.parametrize("method", ["partial_fit", "train_stream"])
+def test_max_iter_cannot_change_during_a_stream(method):
+    data = make_data()
+    som = HSOM(width = 4, height = 3, input_dim = data.shape[1:], random_seed = 0)
+    som.partial_fit(data, max_iter = 3 * len(data))
+    with pytest.raises(ValueError, match = "max_iter"):
+        if method == "partial_fit":
+            som.partial_fit(data, max_iter = 5 * len(data))
+        else:
+            som.train_stream([data], max_iter = 5 * len(data))
+    som.random_init(data) # a new run can use another max_iter
+    som.partial_fit(data, max_iter = 5 * len(data))
+
+@pytest.mark.parametrize("distance_function, window", [("dtw", None), ("dtw", 3), ("euclidean", None)])
+@pytest.mark.parametrize("neighborhood_function, neighborhood_cutoff", [("gaussian", 0.0), ("bubble", 0.0), ("mexican_hat", 0.05)])
+def test_jit_loop_matches_python_loop(distance_function, window, neighborhood_function, neighborhood_cutoff):
+    data = make_data()
+    params = dict(algorithm = "online", distance_function = distance_function, window = window, track_errors = "online",
+                  neighborhood_function = neighborhood_function, neighborhood_cutoff = neighborhood_cutoff)
+    som = HSOM(width = 4, height = 3, input_dim = data.shape[1:], random_seed = 0)
+    som.train(data, epochs = 2, engine = "jit", verbose = False, **params)
+    reference = HSOM(width = 4, height = 3, input_dim = data.shape[1:], random_seed = 0)
+    reference.train(data, epochs = 2, engine = "python", verbose = False, **params)
+
+    np.testing.assert_allclose(som.get_prototypes(), reference.get_prototypes(), rtol = 1e-10, atol = 1e-12)
+    np.testing.assert_allclose(som.get_QE_history(), reference.get_QE_history(), rtol = 1e-10)
+    np.testing.assert_allclose(som.get_TE_history(), reference.get_TE_history(), rtol = 1e-10)